@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 import os
 
@@ -8,8 +9,26 @@ from dotenv import load_dotenv
 
 import json
 
+try:  # orjson es opcional (pip install invoice-splitter[fast]); si no está, usamos json
+    import orjson
 
-def _project_root() -> Path:
+    def _json_loads(data: bytes):
+        return orjson.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:  # pragma: no cover - depende del entorno
+
+    def _json_loads(data: bytes):
+        return json.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+@lru_cache(maxsize=1)
+def project_root() -> Path:
     """
     Devuelve la raíz del proyecto (carpeta que contiene /src).
     Estructura esperada:
@@ -17,12 +36,34 @@ def _project_root() -> Path:
         src/
           invoice_splitter/
             config.py   <-- aquí
+    Se calcula una sola vez (resolve() hace stat/readlink por cada componente).
     """
     return Path(__file__).resolve().parents[2]
 
 
+_DOTENV_LOADED = False
+
+
+def _load_dotenv_once() -> None:
+    """
+    Carga .env desde la raíz del proyecto una sola vez por proceso.
+    override=False: las variables ya definidas en el entorno tienen prioridad.
+    """
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    load_dotenv(project_root() / ".env", override=False)
+    _DOTENV_LOADED = True
+
+
+def reset_dotenv() -> None:
+    """Permite volver a cargar .env en el próximo _load_dotenv_once() (útil en tests)."""
+    global _DOTENV_LOADED
+    _DOTENV_LOADED = False
+
+
 # Cargamos .env desde la raíz del proyecto.
-load_dotenv(_project_root() / ".env")
+_load_dotenv_once()
 
 
 CONFIG_DIR_NAME = "InvoiceSplitter"
@@ -43,27 +84,64 @@ def get_user_config_path() -> Path:
     return base / CONFIG_DIR_NAME / CONFIG_FILE_NAME
 
 
+# Cache en memoria del config.json (se invalida por mtime o al guardar)
+_user_config_cache: dict | None = None
+_user_config_mtime: float | None = None
+
+
 def load_user_config() -> dict:
+    """
+    Lee config.json del usuario. Si el archivo no cambió (mismo mtime) se devuelve
+    una copia del dict cacheado, sin volver a leer/parsear el JSON.
+    """
+    global _user_config_cache, _user_config_mtime
+
     path = get_user_config_path()
-    if not path.exists():
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
         return {}
+
+    if _user_config_cache is not None and mtime == _user_config_mtime:
+        return dict(_user_config_cache)
+
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        cfg = _json_loads(path.read_bytes())
     except Exception:
         # Si está corrupto, no tumbamos la app: volvemos a config vacío
         return {}
 
+    _user_config_cache = cfg
+    _user_config_mtime = mtime
+    return dict(cfg)
+
 
 def save_user_config(cfg: dict) -> None:
+    global _user_config_cache, _user_config_mtime
+
     path = get_user_config_path()
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(cfg, indent=2, ensure_ascii=False), encoding="utf-8")
+    path.write_bytes(_json_dumps(cfg))
+
+    # Invalidar cache: la próxima lectura vuelve a parsear el archivo
+    _user_config_cache = None
+    _user_config_mtime = None
 
 
 def set_excel_path_user_config(excel_path: Path) -> None:
+    global _RESOLVED_EXCEL_PATH
+
     cfg = load_user_config()
     cfg["excel_path"] = str(excel_path)
     save_user_config(cfg)
+    _RESOLVED_EXCEL_PATH = None
+    # El Excel cambió: los Settings memoizados ya no son válidos
+    get_settings.cache_clear()
+    _stat_cached.cache_clear()
+
+
+# Snapshot de la ruta ya resuelta (se limpia en set_excel_path_user_config)
+_RESOLVED_EXCEL_PATH: Path | None = None
 
 
 def get_excel_path_from_sources() -> Path | None:
@@ -71,10 +149,17 @@ def get_excel_path_from_sources() -> Path | None:
     Prioridad:
     1) EXCEL_PATH en .env / variables de entorno
     2) excel_path en config.json del usuario
+
+    La primera ruta resuelta se guarda en memoria y se reutiliza en llamadas siguientes.
     """
+    global _RESOLVED_EXCEL_PATH
+    if _RESOLVED_EXCEL_PATH is not None:
+        return _RESOLVED_EXCEL_PATH
+
     raw_env = os.getenv("EXCEL_PATH", "").strip()
     if raw_env:
-        return Path(raw_env)
+        _RESOLVED_EXCEL_PATH = Path(raw_env)
+        return _RESOLVED_EXCEL_PATH
 
     cfg = load_user_config()
     raw_cfg = str(cfg.get("excel_path", "")).strip()
@@ -87,11 +172,27 @@ def get_excel_path_from_sources() -> Path | None:
         raw_cfg = ""
 
     if raw_cfg:
-        return Path(raw_cfg)
+        _RESOLVED_EXCEL_PATH = Path(raw_cfg)
+        return _RESOLVED_EXCEL_PATH
 
     return None
 
 
+@lru_cache(maxsize=16)
+def _stat_cached(path: str) -> os.stat_result:
+    return os.stat(path)
+
+
+def stat_excel_path(excel_path: Path) -> os.stat_result:
+    """
+    os.stat del Excel, cacheado por ruta (en OneDrive/SMB cada stat puede costar varios ms).
+    Es una foto del momento de la primera consulta: sirve para validar existencia,
+    NO para detectar cambios (mtime) posteriores.
+    Lanza FileNotFoundError si el archivo no existe (no se cachea el error).
+    """
+    return _stat_cached(str(excel_path))
+
+
 @dataclass(frozen=True)
 class Settings:
     """
@@ -109,11 +210,15 @@ class Settings:
     vendors_table: str
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """
     Lee EXCEL_PATH desde:
     - .env / variables de entorno
     - o config.json por usuario (si no hay env)
+
+    Se memoiza por proceso (Settings es inmutable). Si cambias variables de entorno
+    en caliente (tests), usa get_settings.cache_clear().
     """
     excel_path = get_excel_path_from_sources()
     if excel_path is None:
@@ -121,38 +226,13 @@ def get_settings() -> Settings:
             "No se ha configurado el Excel. "
             "Selecciona el archivo desde la UI (File Picker) o define EXCEL_PATH en .env."
         )
-    if not excel_path.exists():
-        raise FileNotFoundError(f"No se encontró el Excel en: {excel_path}")
-
-    default_iva = os.getenv("DEFAULT_IVA", "0.15").strip()
-    date_display_format = os.getenv("DATE_DISPLAY_FORMAT", "dd-mmm-yy").strip()
-    vendors_sheet = os.getenv("VENDORS_SHEET", "Vendors").strip()
-    vendors_table = os.getenv("VENDORS_TABLE", "Vendors_table").strip()
-
-    return Settings(
-        excel_path=excel_path,
-        default_iva=default_iva,
-        date_display_format=date_display_format,
-        vendors_sheet=vendors_sheet,
-        vendors_table=vendors_table,
-    )
-    """
-    Lee variables de entorno (.env) y devuelve un Settings validado.
-    Lanza errores claros si falta algo crítico.
-    """
-    excel_path_raw = os.getenv("EXCEL_PATH", "").strip()
-    if not excel_path_raw:
-        raise ValueError(
-            "Falta EXCEL_PATH en el archivo .env. Ejemplo: EXCEL_PATH=C:\\ruta\\archivo.xlsx"
-        )
-
-    excel_path = Path(excel_path_raw)
-    if not excel_path.exists():
-        raise FileNotFoundError(f"No se encontró el Excel en: {excel_path}")
+    try:
+        stat_excel_path(excel_path)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"No se encontró el Excel en: {excel_path}") from e
 
     default_iva = os.getenv("DEFAULT_IVA", "0.15").strip()
     date_display_format = os.getenv("DATE_DISPLAY_FORMAT", "dd-mmm-yy").strip()
-
     vendors_sheet = os.getenv("VENDORS_SHEET", "Vendors").strip()
     vendors_table = os.getenv("VENDORS_TABLE", "Vendors_table").strip()
 
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Sequence, Tuple
+
+
+def header_index(headers: Iterable[Any], required_names: Sequence[str]) -> Tuple[int, ...]:
+    """
+    Devuelve la posición (0-based) de cada encabezado requerido, en el mismo orden
+    que required_names, recorriendo los headers una sola vez.
+
+    Si falta alguno, lanza KeyError con la lista de encabezados faltantes
+    (cada caller lo traduce a su propio tipo de error / mensaje).
+    """
+    idx: dict = {}
+    for i, h in enumerate(headers):
+        idx.setdefault(h, i)  # igual que list.index: gana la primera aparición
+
+    missing = [name for name in required_names if name not in idx]
+    if missing:
+        raise KeyError(missing)
+
+    return tuple(idx[name] for name in required_names)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+# Cache de workbooks de SOLO LECTURA (data_only), clave = ruta -> ((mtime_ns, size), wb)
+# Permite que load_vendors_from_table y load_vendor_concepts compartan un único parseo
+# del Excel en el arranque / refresco de la UI.
+_WB_CACHE: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+
+def get_readonly_workbook(excel_path: Path | str):
+    """
+    Devuelve el workbook (data_only=True) cacheado para excel_path.
+    - Si el archivo cambió (mtime/tamaño distintos), se vuelve a cargar.
+    - IMPORTANTE: el workbook es compartido; NO se debe modificar ni guardar.
+      Para escribir usa siempre open_workbook_safe (writer).
+
+    No se usa read_only=True porque ReadOnlyWorksheet no expone ws.tables.
+    keep_links=False: no parseamos vínculos externos (este workbook nunca se guarda).
+    """
+    path = str(excel_path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+
+    cached = _WB_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    from openpyxl import load_workbook  # import diferido (arranque más rápido)
+
+    wb = load_workbook(path, data_only=True, keep_vba=False, keep_links=False)
+    _WB_CACHE.clear()  # solo trabajamos con un Excel a la vez
+    _WB_CACHE[path] = (key, wb)
+    return wb
+
+
+def clear_workbook_cache() -> None:
+    """Descarta los workbooks cacheados (útil en tests o tras cambiar de Excel)."""
+    _WB_CACHE.clear()
@@ -4,20 +4,20 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
-from openpyxl import load_workbook
-from openpyxl.utils.cell import range_boundaries
-
+from invoice_splitter.excel._headers import header_index
+from invoice_splitter.excel._wb_cache import get_readonly_workbook
+from invoice_splitter.excel.session import excel_session
 from invoice_splitter.excel.writer import (
     ExcelWriteError,
     ensure_table_exists,
     find_table,
+    lookup_table,
     append_rows_to_table,
-    backup_excel,
-    prune_backups,
+    cell_to_int,
 )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class VendorConcept:
     vendor_id: int
     concept: str
@@ -26,107 +26,100 @@ class VendorConcept:
     sort_order: int
 
 
+_CONCEPT_COLS = ("Vendor ID", "Concept", "Is_default", "Active", "Sort_order")
+_TRUE_TOKENS = frozenset({"1", "true", "yes", "y", "si", "sí"})
+
+
 def _as_bool(v: Any) -> bool:
     if v is None:
         return False
     if isinstance(v, bool):
         return v
-    s = str(v).strip().lower()
-    return s in {"1", "true", "yes", "y", "si", "sí"}
+    return str(v).strip().lower() in _TRUE_TOKENS
 
 
 def load_vendor_concepts(
     *,
     excel_path: Path,
     table_name: str = "Vendor_concepts_table",
+    wb=None,
 ) -> Dict[int, List[VendorConcept]]:
     """
     Lee Vendor_concepts_table (si existe) y retorna dict vendor_id -> conceptos activos ordenados.
     IMPORTANTE: NO crea la tabla si no existe.
+    Si no se pasa `wb`, usa el workbook de solo lectura cacheado por (ruta, mtime).
     """
     try:
-        wb = load_workbook(excel_path, data_only=True)
+        if wb is None:
+            wb = get_readonly_workbook(excel_path)
     except PermissionError as e:
         raise ExcelWriteError(
             "No se puede abrir el Excel para leer conceptos. Probablemente está abierto/bloqueado."
         ) from e
 
-    try:
-        found = _find_table_strict(wb, table_name)
-        if not found:
-            # No existe aún -> catálogo vacío (no creamos nada)
-            return {}
-
-        ws, min_col, min_row, max_col, max_row, headers = found
-
-        idx = {str(h): i for i, h in enumerate(headers)}
-        required = {"Vendor ID", "Concept", "Is_default", "Active", "Sort_order"}
-        missing = required - set(idx.keys())
-        if missing:
-            raise ExcelWriteError(
-                f"Vendor_concepts_table no tiene columnas requeridas: {sorted(missing)}"
-            )
-
-        concepts_by_vendor: Dict[int, List[VendorConcept]] = {}
-
-        for r in range(min_row + 1, max_row + 1):
-            row_vals = [ws.cell(row=r, column=c).value for c in range(min_col, max_col + 1)]
-            raw_vid = row_vals[idx["Vendor ID"]]
-            raw_concept = row_vals[idx["Concept"]]
-
-            if raw_vid is None or raw_concept is None:
-                continue
-
-            try:
-                vendor_id = int(str(raw_vid).strip())
-            except ValueError:
-                continue
-
-            concept = str(raw_concept).strip()
-            if not concept:
-                continue
-
-            is_default = _as_bool(row_vals[idx["Is_default"]])
-            active = _as_bool(row_vals[idx["Active"]])
-            try:
-                sort_order = int(str(row_vals[idx["Sort_order"]] or "0").strip())
-            except ValueError:
-                sort_order = 0
-
-            vc = VendorConcept(
-                vendor_id=vendor_id,
-                concept=concept,
-                is_default=is_default,
-                active=active,
-                sort_order=sort_order,
-            )
-            concepts_by_vendor.setdefault(vendor_id, []).append(vc)
-
-        # filtrar activos + ordenar por sort_order
-        for vid in list(concepts_by_vendor.keys()):
-            active_items = [c for c in concepts_by_vendor[vid] if c.active]
-            active_items.sort(key=lambda x: (x.sort_order, x.concept.lower()))
-            concepts_by_vendor[vid] = active_items
+    found = lookup_table(wb, table_name)
+    if not found:
+        # No existe aún -> catálogo vacío (no creamos nada)
+        return {}
 
-        return concepts_by_vendor
+    ws, info = found
 
-    finally:
-        wb.close()
+    try:
+        vid_i, concept_i, default_i, active_i, sort_i = header_index(
+            (str(h) for h in info.headers), _CONCEPT_COLS
+        )
+    except KeyError as e:
+        raise ExcelWriteError(
+            f"Vendor_concepts_table no tiene columnas requeridas: {sorted(e.args[0])}"
+        ) from e
 
-
-def _find_table_strict(wb, table_name: str):
-    """
-    Busca una tabla por nombre SIN crearla si no existe.
-    Retorna: (ws, min_col, min_row, max_col, max_row, headers) o None
-    """
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        if table_name in ws.tables:
-            table = ws.tables[table_name]
-            min_col, min_row, max_col, max_row = range_boundaries(table.ref)
-            headers = [ws.cell(row=min_row, column=c).value for c in range(min_col, max_col + 1)]
-            return ws, min_col, min_row, max_col, max_row, headers
-    return None
+    concepts_by_vendor: Dict[int, List[VendorConcept]] = {}
+
+    for row_vals in ws.iter_rows(
+        min_row=info.min_row + 1,
+        max_row=info.max_row,
+        min_col=info.min_col,
+        max_col=info.max_col,
+        values_only=True,
+    ):
+        raw_vid = row_vals[vid_i]
+        raw_concept = row_vals[concept_i]
+
+        if raw_vid is None or raw_concept is None:
+            continue
+
+        try:
+            vendor_id = cell_to_int(raw_vid)
+        except ValueError:
+            continue
+
+        concept = str(raw_concept).strip()
+        if not concept:
+            continue
+
+        is_default = _as_bool(row_vals[default_i])
+        active = _as_bool(row_vals[active_i])
+        try:
+            sort_order = cell_to_int(row_vals[sort_i] or 0)
+        except ValueError:
+            sort_order = 0
+
+        vc = VendorConcept(
+            vendor_id=vendor_id,
+            concept=concept,
+            is_default=is_default,
+            active=active,
+            sort_order=sort_order,
+        )
+        concepts_by_vendor.setdefault(vendor_id, []).append(vc)
+
+    # filtrar activos + ordenar por sort_order
+    for vid in list(concepts_by_vendor.keys()):
+        active_items = [c for c in concepts_by_vendor[vid] if c.active]
+        active_items.sort(key=lambda x: (x.sort_order, x.concept.lower()))
+        concepts_by_vendor[vid] = active_items
+
+    return concepts_by_vendor
 
 
 def add_concepts_for_vendor(
@@ -149,82 +142,90 @@ def add_concepts_for_vendor(
     if not concepts_to_add:
         return
 
-    backup_excel(excel_path, backup_dir)
-    prune_backups(backup_dir)
+    with excel_session(excel_path, backup_dir) as wb:
+        add_concepts_to_workbook(
+            wb,
+            vendor_id=vendor_id,
+            concepts_to_add=concepts_to_add,
+            table_name=table_name,
+        )
+    # ✅ al salir de la sesión se hace backup y se persiste realmente en el archivo
+
 
+def add_concepts_to_workbook(
+    wb,
+    *,
+    vendor_id: int,
+    concepts_to_add: List[str],
+    table_name: str = "Vendor_concepts_table",
+) -> None:
+    """
+    Igual que add_concepts_for_vendor pero sobre un workbook ya abierto
+    (no hace backup ni guarda). Espera conceptos ya normalizados (strip, sin vacíos).
+    """
+    # si no existe, la creamos en hoja Config (según tu writer) y seguimos
+    ws, info = find_table(
+        wb, table_name
+    )  # find_table puede crear en memoria [1](https://kelloggcompany-my.sharepoint.com/personal/andres_saavedra_kellogg_com1/Documents/Desktop/temp/main_window.py)
+
+    # headers
     try:
-        wb = load_workbook(excel_path)
-    except PermissionError as e:
+        vid_i, concept_i, _default_i, _active_i, sort_i = header_index(
+            (str(h) for h in info.headers), _CONCEPT_COLS
+        )
+    except KeyError as e:
         raise ExcelWriteError(
-            "No se puede abrir el Excel para guardar conceptos (bloqueado)."
+            f"Vendor_concepts_table no tiene columnas requeridas: {sorted(e.args[0])}"
         ) from e
 
-    try:
-        # si no existe, la creamos en hoja Config (según tu writer) y seguimos
-        ws, info = find_table(
-            wb, table_name
-        )  # find_table puede crear en memoria [1](https://kelloggcompany-my.sharepoint.com/personal/andres_saavedra_kellogg_com1/Documents/Desktop/temp/main_window.py)
-
-        # headers
-        idx = {str(h): i for i, h in enumerate(info.headers)}
-        required = {"Vendor ID", "Concept", "Is_default", "Active", "Sort_order"}
-        missing = required - set(idx.keys())
-        if missing:
-            raise ExcelWriteError(
-                f"Vendor_concepts_table no tiene columnas requeridas: {sorted(missing)}"
-            )
-
-        # existentes y max sort_order
-        existing = set()
-        max_order = 0
-
-        for r in range(info.min_row + 1, info.max_row + 1):
-            row_vals = [
-                ws.cell(row=r, column=c).value for c in range(info.min_col, info.max_col + 1)
-            ]
-            raw_vid = row_vals[idx["Vendor ID"]]
-            raw_concept = row_vals[idx["Concept"]]
-            if raw_vid is None or raw_concept is None:
-                continue
+    # existentes y max sort_order (una sola pasada por la tabla)
+    existing = set()
+    max_order = 0
+
+    for row_vals in ws.iter_rows(
+        min_row=info.min_row + 1,
+        max_row=info.max_row,
+        min_col=info.min_col,
+        max_col=info.max_col,
+        values_only=True,
+    ):
+        raw_vid = row_vals[vid_i]
+        raw_concept = row_vals[concept_i]
+        if raw_vid is None or raw_concept is None:
+            continue
+        try:
+            vid = cell_to_int(raw_vid)
+        except ValueError:
+            continue
+        concept = str(raw_concept).strip()
+        if not concept:
+            continue
+
+        if vid == vendor_id:
+            existing.add(concept.lower())
             try:
-                vid = int(str(raw_vid).strip())
+                so = cell_to_int(row_vals[sort_i] or 0)
+                max_order = max(max_order, so)
             except ValueError:
-                continue
-            concept = str(raw_concept).strip()
-            if not concept:
-                continue
-
-            if vid == vendor_id:
-                existing.add(concept.lower())
-                try:
-                    so = int(str(row_vals[idx["Sort_order"]] or "0").strip())
-                    max_order = max(max_order, so)
-                except ValueError:
-                    pass
-
-        order = max_order + 1
-        rows = []
-        for c in concepts_to_add:
-            if c.lower() in existing:
-                continue
-            rows.append(
-                {
-                    "Vendor ID": vendor_id,
-                    "Concept": c,
-                    "Is_default": False,
-                    "Active": True,
-                    "Sort_order": order,
-                }
-            )
-            existing.add(c.lower())
-            order += 1
-
-        if rows:
-            # refrescar info y append
-            ws, info = find_table(wb, table_name)
-            append_rows_to_table(ws, info, rows)
-
-        wb.save(excel_path)  # ✅ aquí persiste realmente en el archivo
-
-    finally:
-        wb.close()
+                pass
+
+    order = max_order + 1
+    rows = []
+    for c in concepts_to_add:
+        if c.lower() in existing:
+            continue
+        rows.append(
+            {
+                "Vendor ID": vendor_id,
+                "Concept": c,
+                "Is_default": False,
+                "Active": True,
+                "Sort_order": order,
+            }
+        )
+        existing.add(c.lower())
+        order += 1
+
+    if rows:
+        # ws/info siguen vigentes: hasta aquí no se ha modificado la tabla
+        append_rows_to_table(ws, info, rows)
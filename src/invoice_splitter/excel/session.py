@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from invoice_splitter.excel.writer import (
+    ExcelWriteError,
+    backup_path_for,
+    open_workbook_safe,
+    prune_backups,
+    save_workbook_atomic,
+)
+
+
+@contextmanager
+def excel_session(
+    excel_path: Path,
+    backup_dir: Path,
+    keep_last_n: int = 30,
+    keep_days: int = 30,
+) -> Iterator:
+    """
+    Sesión de escritura sobre el Excel: abre el workbook 1 vez, permite encadenar
+    varias mutaciones (vendor + conceptos, etc.) y al salir sin errores:
+    - guarda el workbook 1 vez (de forma atómica); el original pasa a ser el backup
+    - aplica la retención de backups
+
+    Si el bloque lanza una excepción no se hace backup ni se guarda nada.
+
+    Uso:
+        with excel_session(excel_path, backup_dir) as wb:
+            add_vendor_to_workbook(wb, ...)
+            add_concepts_to_workbook(wb, ...)
+    """
+    wb = open_workbook_safe(excel_path)
+    try:
+        yield wb
+
+        try:
+            save_workbook_atomic(wb, excel_path, backup_to=backup_path_for(excel_path, backup_dir))
+        except PermissionError as e:
+            raise ExcelWriteError(
+                "No se pudo guardar el Excel. Probablemente está abierto/bloqueado.\n"
+                "Cierra el archivo y vuelve a intentar."
+            ) from e
+
+        prune_backups(backup_dir, keep_last_n=keep_last_n, keep_days=keep_days)
+    finally:
+        wb.close()
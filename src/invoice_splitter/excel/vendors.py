@@ -1,22 +1,21 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Tuple
-
-from openpyxl import load_workbook
-from openpyxl.utils.cell import range_boundaries
-
-
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.utils.cell import range_boundaries
+from typing import List
 
-from invoice_splitter.excel.writer import backup_excel, prune_backups, ExcelWriteError
+from invoice_splitter.excel._headers import header_index
+from invoice_splitter.excel._wb_cache import get_readonly_workbook
+from invoice_splitter.excel.session import excel_session
+from invoice_splitter.excel.writer import (
+    cell_to_int,
+    col_letter,
+    ExcelWriteError,
+    ref_bounds,
+)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Vendor:
     """
     Representa un vendor leído desde Vendors_table.
@@ -32,6 +31,7 @@ def load_vendors_from_table(
     excel_path: str,
     sheet_name: str = "Vendors",
     table_name: str = "Vendors_table",
+    wb=None,
 ) -> List[Vendor]:
     """
     Carga la lista de vendors desde una Excel Table (ListObject) llamada table_name
@@ -41,13 +41,15 @@ def load_vendors_from_table(
     - La tabla debe tener columnas "ID" y "Vendor" (encabezados).
     - No modifica el archivo Excel.
     - Devuelve lista ordenada por vendor_name.
+    - Si no se pasa `wb`, usa el workbook de solo lectura cacheado por (ruta, mtime).
 
     Manejo de errores:
     - Si el archivo está bloqueado y Windows no permite lectura, se lanza PermissionError
       con mensaje claro.
     """
     try:
-        wb = load_workbook(excel_path, data_only=True, read_only=False)
+        if wb is None:
+            wb = get_readonly_workbook(excel_path)
     except PermissionError as e:
         raise PermissionError(
             "No se puede abrir el Excel. Probablemente está abierto en modo exclusivo "
@@ -69,32 +71,35 @@ def load_vendors_from_table(
 
     table = ws.tables[table_name]
     # table.ref es un rango tipo "A1:B20"
-    min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+    min_col, min_row, max_col, max_row = ref_bounds(table.ref)
+
+    # Leemos la tabla completa en una sola pasada (encabezados + datos).
+    # iter_rows(values_only=True) evita crear/consultar cada celda con ws.cell().
+    rows_iter = ws.iter_rows(
+        min_row=min_row,
+        max_row=max_row,
+        min_col=min_col,
+        max_col=max_col,
+        values_only=True,
+    )
 
-    # Leemos encabezados (fila 1 del rango de la tabla)
-    headers = []
-    for col in range(min_col, max_col + 1):
-        headers.append(ws.cell(row=min_row, column=col).value)
+    # Encabezados (fila 1 del rango de la tabla)
+    headers = list(next(rows_iter))
 
     # Normalizamos índices de columnas
     # Esperamos "ID" y "Vendor" exactamente (si difieren en Excel, ajustamos aquí)
     try:
-        id_idx = headers.index("ID")
-        vendor_idx = headers.index("Vendor")
-    except ValueError:
+        id_idx, vendor_idx = header_index(headers, ("ID", "Vendor"))
+    except KeyError as e:
         raise ValueError(
             f"Encabezados inválidos en {table_name}. "
             f"Se esperaban columnas 'ID' y 'Vendor'. Encabezados encontrados: {headers}"
-        )
+        ) from e
 
     vendors: List[Vendor] = []
 
     # Filas de datos: desde min_row + 1 hasta max_row
-    for row in range(min_row + 1, max_row + 1):
-        row_values = []
-        for col in range(min_col, max_col + 1):
-            row_values.append(ws.cell(row=row, column=col).value)
-
+    for row, row_values in enumerate(rows_iter, start=min_row + 1):
         raw_id = row_values[id_idx]
         raw_vendor = row_values[vendor_idx]
 
@@ -110,17 +115,15 @@ def load_vendors_from_table(
             )
 
         try:
-            vendor_id = int(str(raw_id).strip())
+            vendor_id = cell_to_int(raw_id)
         except ValueError as e:
             raise ValueError(f"ID de vendor inválido en {table_name} fila {row}: {raw_id}") from e
 
         vendor_name = str(raw_vendor).strip()
         vendors.append(Vendor(vendor_id=vendor_id, vendor_name=vendor_name))
 
-    wb.close()
-
-    # Ordenamos alfabéticamente para el combobox
-    vendors.sort(key=lambda v: v.vendor_name.lower())
+    # Ordenamos alfabéticamente para el combobox (key= se evalúa una vez por vendor)
+    vendors.sort(key=lambda v: v.vendor_name.casefold())
     return vendors
 
 
@@ -138,71 +141,85 @@ def add_vendor_to_table(
     """
     Inserta un vendor nuevo en Vendors_table (columnas ID y Vendor).
     - Bloquea si el ID ya existe (la UI ya lo valida, aquí lo validamos de nuevo por seguridad).
-    - Hace backup por sesión simple (crea uno nuevo por cada llamada).
+    - Hace backup por sesión simple (crea uno nuevo por cada llamada), pero solo después
+      de validar hoja/tabla/ID: si la validación falla no se copia el Excel.
+    Para encadenar más cambios con un solo backup/guardado usa excel_session +
+    add_vendor_to_workbook.
+    """
+    with excel_session(excel_path, backup_dir, keep_last_n=keep_last_n, keep_days=keep_days) as wb:
+        add_vendor_to_workbook(
+            wb,
+            sheet_name=sheet_name,
+            table_name=table_name,
+            vendor_id=vendor_id,
+            vendor_name=vendor_name,
+        )
+
+
+def add_vendor_to_workbook(
+    wb,
+    *,
+    sheet_name: str,
+    table_name: str,
+    vendor_id: int,
+    vendor_name: str,
+) -> None:
+    """
+    Igual que add_vendor_to_table pero sobre un workbook ya abierto (no hace backup ni guarda).
     """
-    # Backup (simple)
-    backup_excel(excel_path, backup_dir)
-    prune_backups(backup_dir, keep_last_n=keep_last_n, keep_days=keep_days)
 
+    if sheet_name not in wb.sheetnames:
+        raise ExcelWriteError(f"No existe la hoja '{sheet_name}'.")
+
+    ws = wb[sheet_name]
+    if table_name not in ws.tables:
+        raise ExcelWriteError(f"No existe la tabla '{table_name}' en la hoja '{sheet_name}'.")
+
+    table = ws.tables[table_name]
+    min_col, min_row, max_col, max_row = ref_bounds(table.ref)
+
+    # headers
+    headers = [ws.cell(row=min_row, column=c).value for c in range(min_col, max_col + 1)]
     try:
-        wb = load_workbook(excel_path)
-    except PermissionError as e:
+        id_idx, vendor_idx = header_index(headers, ("ID", "Vendor"))
+    except KeyError as e:
         raise ExcelWriteError(
-            "No se puede abrir el Excel (probablemente está abierto o bloqueado por OneDrive/SharePoint)."
+            f"Encabezados inválidos en {table_name}. Se requieren columnas 'ID' y 'Vendor'. "
+            f"Encontrados: {headers}"
         ) from e
 
-    try:
-        if sheet_name not in wb.sheetnames:
-            raise ExcelWriteError(f"No existe la hoja '{sheet_name}'.")
-
-        ws = wb[sheet_name]
-        if table_name not in ws.tables:
-            raise ExcelWriteError(f"No existe la tabla '{table_name}' en la hoja '{sheet_name}'.")
-
-        table = ws.tables[table_name]
-        min_col, min_row, max_col, max_row = range_boundaries(table.ref)
-
-        # headers
-        headers = [ws.cell(row=min_row, column=c).value for c in range(min_col, max_col + 1)]
-        if "ID" not in headers or "Vendor" not in headers:
-            raise ExcelWriteError(
-                f"Encabezados inválidos en {table_name}. Se requieren columnas 'ID' y 'Vendor'. "
-                f"Encontrados: {headers}"
-            )
+    id_col = min_col + id_idx
+    vendor_col = min_col + vendor_idx
+
+    # Validación de ID duplicado: leemos solo la columna ID en una pasada
+    existing_ids = set()
+    for (cell_id,) in ws.iter_rows(
+        min_row=min_row + 1,
+        max_row=max_row,
+        min_col=id_col,
+        max_col=id_col,
+        values_only=True,
+    ):
+        if cell_id is None:
+            continue
+        try:
+            existing_ids.add(cell_to_int(cell_id))
+        except ValueError:
+            # si hay basura en Excel, lo ignoramos aquí
+            continue
+
+    if vendor_id in existing_ids:
+        raise ExcelWriteError(f"El Vendor ID {vendor_id} ya existe en {table_name}.")
+
+    # Insertar nueva fila al final de la tabla
+    new_row = max_row + 1
+    ws.cell(row=new_row, column=id_col, value=vendor_id)
+    ws.cell(row=new_row, column=vendor_col, value=vendor_name)
 
-        id_idx = headers.index("ID")
-        vendor_idx = headers.index("Vendor")
-
-        id_col = min_col + id_idx
-        vendor_col = min_col + vendor_idx
-
-        # Validación de ID duplicado
-        for r in range(min_row + 1, max_row + 1):
-            cell_id = ws.cell(row=r, column=id_col).value
-            if cell_id is None:
-                continue
-            try:
-                if int(str(cell_id).strip()) == vendor_id:
-                    raise ExcelWriteError(f"El Vendor ID {vendor_id} ya existe en {table_name}.")
-            except ValueError:
-                # si hay basura en Excel, lo ignoramos aquí
-                continue
-
-        # Insertar nueva fila al final de la tabla
-        new_row = max_row + 1
-        ws.cell(row=new_row, column=id_col, value=vendor_id)
-        ws.cell(row=new_row, column=vendor_col, value=vendor_name)
-
-        # Expandir ref
-        start_cell = f"{get_column_letter(min_col)}{min_row}"
-        end_cell = f"{get_column_letter(max_col)}{new_row}"
-        ws.tables[table_name].ref = f"{start_cell}:{end_cell}"
-
-        # Guardar
-        wb.save(excel_path)
-
-    finally:
-        wb.close()
+    # Expandir ref
+    start_cell = f"{col_letter(min_col)}{min_row}"
+    end_cell = f"{col_letter(max_col)}{new_row}"
+    ws.tables[table_name].ref = f"{start_cell}:{end_cell}"
 
 
 # Pequeña prueba manual: permite ejecutar este archivo directamente
@@ -1,22 +1,32 @@
 from __future__ import annotations
 
 import logging
+import os
+import re
 import shutil
+import sys
+import tempfile
 from copy import copy
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
 from openpyxl import load_workbook
+from openpyxl.cell.cell import Cell
+from openpyxl.styles.cell_style import StyleArray
 from openpyxl.utils import get_column_letter
 from openpyxl.utils.cell import range_boundaries
 from openpyxl.worksheet.table import Table
 
+from invoice_splitter.excel._wb_cache import clear_workbook_cache
+
 logger = logging.getLogger("invoice_splitter")
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TableInfo:
     sheet_name: str
     table_name: str
@@ -25,17 +35,73 @@ class TableInfo:
     max_col: int
     max_row: int
     headers: List[str]
+    # True solo si la tabla se acaba de crear en ensure_table_exists (fila 2 vacía garantizada)
+    fresh: bool = field(default=False, compare=False)
+    # Mapa 'header' -> columna absoluta (en la hoja); se calcula 1 vez por TableInfo
+    col_map: Dict[str, int] = field(init=False, repr=False, compare=False)
+    # "A1:K" -> la parte fija del table.ref (solo cambia la última fila)
+    ref_prefix: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "col_map",
+            {str(header): self.min_col + idx for idx, header in enumerate(self.headers)},
+        )
+        object.__setattr__(
+            self, "ref_prefix", f"{self.min_col_letter}{self.min_row}:{self.max_col_letter}"
+        )
+
+    def ref_to(self, end_row: int) -> str:
+        """table.ref de esta tabla terminando en end_row (ej: 'A1:K57')."""
+        return f"{self.ref_prefix}{end_row}"
+
+    @property
+    def min_col_letter(self) -> str:
+        return col_letter(self.min_col)
+
+    @property
+    def max_col_letter(self) -> str:
+        return col_letter(self.max_col)
 
 
 class ExcelWriteError(RuntimeError):
     """Errores controlados al escribir Excel (archivo bloqueado, tabla no encontrada, etc.)."""
 
 
+def cell_to_int(value: Any) -> int:
+    """
+    Convierte el valor de una celda a int.
+    - Fast path: openpyxl ya entrega int para celdas numéricas enteras (sin str/strip).
+    - Resto: int(str(value).strip()); lanza ValueError si no es un entero válido.
+    """
+    if type(value) is int:
+        return value
+    return int(str(value).strip())
+
+
+@lru_cache(maxsize=1024)
+def col_letter(col_idx: int) -> str:
+    """get_column_letter memoizado (las tablas usan siempre las mismas columnas)."""
+    return get_column_letter(col_idx)
+
+
+@lru_cache(maxsize=256)
+def ref_bounds(ref: str) -> Tuple[int, int, int, int]:
+    """
+    range_boundaries(ref) memoizado: (min_col, min_row, max_col, max_row).
+    La clave es el propio string "A1:Z99"; al reescribir table.ref cambia la clave,
+    así que no hace falta invalidar nada.
+    """
+    return range_boundaries(ref)
+
+
 # -----------------------
 # Excel sheet naming helpers (31 chars + invalid chars)
 # -----------------------
 
-_INVALID_SHEET_CHARS = r"[:\\/?*\[\]]"  # Excel no permite : \ / ? * [ ]
+_INVALID_SHEET_CHARS = ":\\/?*[]"  # Excel no permite : \ / ? * [ ]
+_STRIP_SHEET_CHARS = str.maketrans("", "", _INVALID_SHEET_CHARS)
 _MAX_SHEET_LEN = 31  # Límite Excel 31 caracteres
 
 
@@ -46,10 +112,7 @@ def sanitize_sheet_name(name: str) -> str:
     - Recorta a 31 caracteres
     - Evita vacío
     """
-    import re
-
-    s = (name or "").strip()
-    s = re.sub(_INVALID_SHEET_CHARS, "", s)
+    s = (name or "").strip().translate(_STRIP_SHEET_CHARS)
     if not s:
         s = "Sheet"
     s = s[:_MAX_SHEET_LEN]
@@ -109,47 +172,156 @@ EXTRA_HEADERS_BY_TABLE = {
 }
 
 
-def get_table_headers(table_name: str) -> list[str]:
-
+_TABLE_HEADERS: Dict[str, Tuple[str, ...]] = {
     # Tablas de configuración / catálogo (Excel como fuente de verdad)
-    if table_name == "Vendor_concepts_table":
-        return ["Vendor ID", "Concept", "Is_default", "Active", "Sort_order"]
-
-    if table_name == "Vendor_services_table":
-        # Base para vendors complejos (Claro/Binaria/etc.). La iremos ampliando en Fase D.
-        return ["Vendor ID", "Service type", "Table name", "Has_split", "Extra fields"]
-
-    if table_name == "General_registry_table":
-        return [
-            "Date",
-            "Type",
-            "FC/NC number",
-            "Affected invoice",
-            "ID",
-            "Vendor",
-            "Service/ concept",
-            "Subtotal",
-            "% IVA",
-            "IVA",
-            "Total",
-        ]
-
-    # Tablas “normales” (split)
-    return BASE_HEADERS + EXTRA_HEADERS_BY_TABLE.get(table_name, [])
+    "Vendor_concepts_table": ("Vendor ID", "Concept", "Is_default", "Active", "Sort_order"),
+    # Base para vendors complejos (Claro/Binaria/etc.). La iremos ampliando en Fase D.
+    "Vendor_services_table": (
+        "Vendor ID",
+        "Service type",
+        "Table name",
+        "Has_split",
+        "Extra fields",
+    ),
+    "General_registry_table": (
+        "Date",
+        "Type",
+        "FC/NC number",
+        "Affected invoice",
+        "ID",
+        "Vendor",
+        "Service/ concept",
+        "Subtotal",
+        "% IVA",
+        "IVA",
+        "Total",
+    ),
+    # Tablas “normales” (split) con columnas extra
+    **{name: tuple(BASE_HEADERS) + tuple(extra) for name, extra in EXTRA_HEADERS_BY_TABLE.items()},
+}
+_BASE_HEADERS = tuple(BASE_HEADERS)
+
+
+def get_table_headers(table_name: str) -> Tuple[str, ...]:
+    """Headers para auto-crear la tabla (tuplas precalculadas al importar; no mutar)."""
+    # Tablas “normales” (split) sin columnas extra -> BASE_HEADERS
+    return _TABLE_HEADERS.get(table_name, _BASE_HEADERS)
 
 
 # -----------------------
 # Backups + retención
 # -----------------------
-def backup_excel(excel_path: Path, backup_dir: Path) -> Path:
-    """Crea backup con timestamp en backup_dir."""
-    backup_dir.mkdir(parents=True, exist_ok=True)
+_FICLONE = 0x40049409  # ioctl Linux (btrfs/XFS): reflink del archivo completo
+
+
+def _clone_file(src: Path, dst: Path) -> bool:
+    """
+    Intenta una copia copy-on-write (reflink): O(1) sin importar el tamaño del Excel.
+    - Linux: ioctl FICLONE (btrfs, XFS con reflink, ...)
+    - macOS: clonefile(2) (APFS)
+    Devuelve False si la plataforma / filesystem no lo soporta (el caller hace copia normal).
+    """
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            return False
+        shutil.copystat(src, dst)
+        return True
+
+    if sys.platform == "darwin":
+        import ctypes
+
+        try:
+            libc = ctypes.CDLL("/usr/lib/libSystem.dylib", use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        except (OSError, AttributeError):
+            return False
+
+    return False
+
+
+def backup_path_for(excel_path: Path | str, backup_dir: Path | str) -> Path:
+    """Ruta (con timestamp) del próximo backup en backup_dir; crea la carpeta si no existe."""
+    # os.path con strings (sin objetos Path intermedios); Path solo en el valor devuelto
+    bd = os.fspath(backup_dir)
+    os.makedirs(bd, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(os.fspath(excel_path)))
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    dst = backup_dir / f"{excel_path.stem}_backup_{ts}{excel_path.suffix}"
-    shutil.copy2(excel_path, dst)
+    return Path(os.path.join(bd, f"{stem}_backup_{ts}{ext}"))
+
+
+def _copy_file_range(src: Path, dst: Path) -> bool:
+    """
+    Linux: copia dentro del kernel con os.copy_file_range (sin pasar los bytes por
+    Python; en NFS/SMB puede ser copia del lado del servidor). False si no se puede.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if n == 0:
+                    break
+                remaining -= n
+    except OSError:
+        return False
+    if remaining > 0:
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _fast_copy(src: Path, dst: Path) -> None:
+    """Copia src -> dst con el método más barato disponible: reflink, copy_file_range, copy2."""
+    if not _clone_file(src, dst) and not _copy_file_range(src, dst):
+        shutil.copy2(src, dst)
+
+
+def backup_excel(excel_path: Path, backup_dir: Path) -> Path:
+    """Crea backup con timestamp en backup_dir (reflink / copia en kernel si se puede)."""
+    dst = backup_path_for(excel_path, backup_dir)
+    _fast_copy(excel_path, dst)
     return dst
 
 
+_BACKUP_EXTS = (".xlsx", ".xlsm")
+# Timestamp que backup_excel embebe en el nombre: *_backup_YYYYMMDD_HHMMSS.xlsx
+_BK_RE = re.compile(r"_backup_(\d{8}_\d{6})\.(?:xlsx|xlsm)$", re.IGNORECASE)
+
+
+def _backup_timestamp(entry: os.DirEntry) -> float:
+    """
+    Momento del backup: se toma del nombre del archivo (sin syscalls);
+    solo si el nombre no trae un timestamp válido se usa el mtime.
+    """
+    m = _BK_RE.search(entry.name)
+    if m:
+        try:
+            return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    return entry.stat().st_mtime
+
+
+def _iter_backups(backup_dir: Path) -> Iterator[os.DirEntry]:
+    """
+    Recorre backup_dir con os.scandir y devuelve solo los backups
+    (*_backup_*.xlsx / .xlsm). is_file()/stat() de DirEntry reutilizan
+    la info del listado (en Windows sin syscalls extra).
+    """
+    with os.scandir(backup_dir) as it:
+        for e in it:
+            name = e.name
+            if "_backup_" in name and name.lower().endswith(_BACKUP_EXTS) and e.is_file():
+                yield e
+
+
 def prune_backups(backup_dir: Path, keep_last_n: int = 30, keep_days: int = 30) -> None:
     """
     Retención combinada:
@@ -158,40 +330,40 @@ def prune_backups(backup_dir: Path, keep_last_n: int = 30, keep_days: int = 30)
 
     Esto cumple: "conservar últimos 30 backups o 30 días (lo que pase primero)".
     """
-    if not backup_dir.exists():
-        return
-
-    now = datetime.now()
-    cutoff = now - timedelta(days=keep_days)
+    cutoff_ts = (datetime.now() - timedelta(days=keep_days)).timestamp()
 
-    # Backups típicos: *_backup_YYYYMMDD_HHMMSS.xlsx (o .xlsm si algún día cambias)
-    backups = [
-        p
-        for p in backup_dir.glob("*_backup_*.*")
-        if p.is_file() and p.suffix.lower() in {".xlsx", ".xlsm"}
-    ]
+    # 1 sola pasada por la carpeta: (path, timestamp del nombre o mtime).
+    # Sin backup_dir.exists() previo: si la carpeta no existe, scandir lo indica.
+    entries: List[Tuple[str, float]] = []
+    try:
+        for e in _iter_backups(backup_dir):
+            try:
+                ts = _backup_timestamp(e)
+            except OSError:
+                continue
+            entries.append((e.path, ts))
+    except FileNotFoundError:
+        return
 
     # 1) por antigüedad
-    for p in backups:
+    survivors: List[Tuple[str, float]] = []
+    for p, ts in entries:
+        if ts >= cutoff_ts:
+            survivors.append((p, ts))
+            continue
         try:
-            mtime = datetime.fromtimestamp(p.stat().st_mtime)
-            if mtime < cutoff:
-                p.unlink()
-                logger.info("RETENCION | eliminado por antigüedad | %s", p)
+            os.unlink(p)
+            logger.info("RETENCION | eliminado por antigüedad | %s", p)
         except Exception as e:
             logger.warning("RETENCION | no se pudo eliminar %s | %s", p, e)
+            survivors.append((p, ts))
 
-    # 2) por cantidad (recalcular después del borrado)
-    backups = [
-        p
-        for p in backup_dir.glob("*_backup_*.*")
-        if p.is_file() and p.suffix.lower() in {".xlsx", ".xlsm"}
-    ]
-    backups.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    # 2) por cantidad (entre los restantes, sin volver a listar la carpeta)
+    survivors.sort(key=itemgetter(1), reverse=True)
 
-    for p in backups[keep_last_n:]:
+    for p, _ts in survivors[keep_last_n:]:
         try:
-            p.unlink()
+            os.unlink(p)
             logger.info("RETENCION | eliminado por exceso de cantidad | %s", p)
         except Exception as e:
             logger.warning("RETENCION | no se pudo eliminar %s | %s", p, e)
@@ -200,10 +372,34 @@ def prune_backups(backup_dir: Path, keep_last_n: int = 30, keep_days: int = 30)
 # -----------------------
 # Workbook helpers
 # -----------------------
-def open_workbook_safe(excel_path: Path):
-    """Abre el workbook controlando archivo bloqueado."""
+# Flags de carga para edición (el workbook se vuelve a guardar):
+# - rich_text=False: no se parsea texto enriquecido celda a celda (no lo usamos)
+# - data_only=False: conservar fórmulas
+# - keep_links=True: keep_links=False sería más rápido pero BORRA los vínculos externos al guardar
+# Tampoco se borran hojas "no usadas" para ahorrar memoria: wb.save las perdería.
+_EDIT_LOAD_KWARGS: Dict[str, Any] = {"rich_text": False, "data_only": False, "keep_links": True}
+
+
+def open_workbook_safe(excel_path: Path, **load_kwargs: Any):
+    """
+    Abre el workbook (modo edición) controlando archivo bloqueado.
+
+    - Usa _EDIT_LOAD_KWARGS; load_kwargs los sobrescribe. Ojo: este workbook se vuelve a
+      guardar, así que NO usar keep_links=False / read_only=True aquí (se perderían
+      los vínculos externos / no hay ws.tables); openpyxl tampoco permite hacer
+      append en modo write-only sobre un archivo existente.
+    - .xlsm: keep_vba=True (sin esto, al guardar se pierden las macros); .xlsx no lo paga.
+    - Antes de cargar se descarta el workbook de solo lectura cacheado (_wb_cache):
+      quedará obsoleto al guardar y así no conviven 2 copias del Excel en memoria.
+    """
+    kwargs = dict(_EDIT_LOAD_KWARGS)
+    if str(excel_path).lower().endswith(".xlsm"):
+        kwargs["keep_vba"] = True
+    kwargs.update(load_kwargs)
+
+    clear_workbook_cache()
     try:
-        return load_workbook(excel_path)
+        return load_workbook(excel_path, **kwargs)
     except PermissionError as e:
         raise ExcelWriteError(
             "No se puede abrir el Excel. Probablemente está abierto en Excel o bloqueado por OneDrive.\n"
@@ -211,6 +407,73 @@ def open_workbook_safe(excel_path: Path):
         ) from e
 
 
+def _fsync_path(path: Path | str) -> None:
+    """fsync de un archivo (o carpeta, en POSIX) por ruta."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _default_file_mode() -> int:
+    """Permisos de un archivo nuevo según la umask actual (0666 & ~umask)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def save_workbook_atomic(wb, excel_path: Path, backup_to: Path | None = None) -> None:
+    """
+    Guarda el workbook de forma atómica:
+    - escribe a un archivo temporal en la MISMA carpeta del Excel (+ fsync)
+    - y lo reemplaza con os.replace (si algo falla, el Excel original queda intacto)
+
+    backup_to (opcional): en vez de copiar el Excel antes de guardar, el original se
+    enlaza (hard link, sin reescribir el archivo) a esa ruta justo antes del os.replace;
+    así excel_path existe en todo momento. Si no se puede enlazar (otro disco/volumen,
+    FS sin hard links) se hace copia normal (reflink si se puede).
+
+    Lanza PermissionError (igual que wb.save) si el Excel está bloqueado.
+    """
+    excel_path = os.fspath(excel_path)
+    folder, name = os.path.split(excel_path)
+    stem, ext = os.path.splitext(name)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{stem}_", suffix=ext, dir=folder or None)
+    os.close(fd)
+    try:
+        wb.save(tmp_name)
+        _fsync_path(tmp_name)
+        # mkstemp crea el temporal con 0600: que el Excel conserve sus permisos
+        # (o los de la umask si es nuevo), si no en carpetas compartidas nadie más lo lee
+        if os.path.exists(excel_path):
+            shutil.copymode(excel_path, tmp_name)
+        else:
+            os.chmod(tmp_name, _default_file_mode())
+
+        if backup_to is not None:
+            try:
+                os.link(excel_path, backup_to)
+            except OSError:
+                # p.ej. backup_dir en otro volumen (EXDEV) o FS sin hard links: copia normal
+                _fast_copy(excel_path, backup_to)
+
+        os.replace(tmp_name, excel_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+    if os.name != "nt":
+        # durabilidad del rename (entrada de directorio)
+        try:
+            _fsync_path(folder or ".")
+        except OSError:
+            pass
+
+
 DEFAULT_SHEET_BY_TABLE = {
     "Vendor_concepts_table": "Config",
     "Vendor_services_table": "Config",
@@ -219,31 +482,72 @@ DEFAULT_SHEET_BY_TABLE = {
 }
 
 
-def find_table(wb, table_name: str) -> Tuple[Any, TableInfo]:
-    """Busca una Excel Table por nombre a través de todas las hojas.
-    Si no existe, la crea (sheet==table por default).
+def build_table_index(wb) -> Dict[str, Any]:
     """
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        if table_name in ws.tables:
-            table = ws.tables[table_name]
-            min_col, min_row, max_col, max_row = range_boundaries(table.ref)
-            headers = []
-            for c in range(min_col, max_col + 1):
-                headers.append(ws.cell(row=min_row, column=c).value)
-            return ws, TableInfo(
-                sheet_name=sheet_name,
-                table_name=table_name,
-                min_col=min_col,
+    Índice {table_name: ws} de todo el workbook en una sola pasada por las hojas.
+    Sirve para resolver varias tablas del mismo workbook sin recorrer todas las
+    hojas en cada find_table.
+    """
+    return {name: ws for ws in wb.worksheets for name in ws.tables.keys()}
+
+
+def lookup_table(
+    wb, table_name: str, index: Dict[str, Any] | None = None
+) -> Tuple[Any, TableInfo] | None:
+    """
+    Busca una Excel Table por nombre SIN crearla. Devuelve (ws, TableInfo) o None.
+
+    index (opcional): resultado de build_table_index(wb); si se pasa, la búsqueda
+    es un lookup directo en vez de recorrer las hojas.
+    """
+    if index is None:
+        ws = next((w for w in wb.worksheets if table_name in w.tables), None)
+    else:
+        ws = index.get(table_name)
+    if ws is None:
+        return None
+
+    table = ws.tables[table_name]
+    min_col, min_row, max_col, max_row = ref_bounds(table.ref)
+    # headers en una sola lectura de la fila (sin ws.cell por columna)
+    headers = list(
+        next(
+            ws.iter_rows(
                 min_row=min_row,
+                max_row=min_row,
+                min_col=min_col,
                 max_col=max_col,
-                max_row=max_row,
-                headers=headers,
+                values_only=True,
             )
+        )
+    )
+    return ws, TableInfo(
+        sheet_name=ws.title,
+        table_name=table_name,
+        min_col=min_col,
+        min_row=min_row,
+        max_col=max_col,
+        max_row=max_row,
+        headers=headers,
+    )
+
+
+def find_table(wb, table_name: str, index: Dict[str, Any] | None = None) -> Tuple[Any, TableInfo]:
+    """Busca una Excel Table por nombre a través de todas las hojas.
+    Si no existe, la crea (sheet==table por default).
+
+    index (opcional): resultado de build_table_index(wb); si se pasa, la búsqueda
+    es un lookup directo y las tablas creadas aquí se registran en él.
+    """
+    found = lookup_table(wb, table_name, index)
+    if found is not None:
+        return found
 
     # Si no se encontró, crear hoja + tabla automáticamente (Fase 1)
     preferred_sheet = DEFAULT_SHEET_BY_TABLE.get(table_name, table_name)
     ws, info = ensure_table_exists(wb, table_name, sheet_name=preferred_sheet)
+    if index is not None:
+        index[table_name] = ws
     logger.info("TABLA CREADA AUTOMATICAMENTE tabla=%s hoja=%s", table_name, info.sheet_name)
     return ws, info
 
@@ -280,7 +584,7 @@ def ensure_table_exists(
             ws.cell(row=1, column=idx, value=h)
 
     # Crear la tabla con ref A1:<lastcol>2 (Opción A)
-    last_col_letter = get_column_letter(len(headers))
+    last_col_letter = col_letter(len(headers))
     ref = f"A1:{last_col_letter}2"  # header + 1 fila vacía (sin dummy data)
     table = Table(
         displayName=table_name, ref=ref
@@ -290,7 +594,7 @@ def ensure_table_exists(
     )  # add_table [2](https://github.com/dotKz/api-mega-list)[3](https://www.splitmyinvoice.com/)
 
     # Construir TableInfo consistente con tu estructura
-    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    min_col, min_row, max_col, max_row = ref_bounds(ref)
     info = TableInfo(
         sheet_name=ws.title,
         table_name=table_name,
@@ -298,91 +602,169 @@ def ensure_table_exists(
         min_row=min_row,
         max_col=max_col,
         max_row=max_row,
-        headers=headers,
+        headers=list(headers),
+        fresh=True,
     )
     return ws, info
 
 
-def _header_to_col_index(info: TableInfo) -> Dict[str, int]:
-    """Mapa 'header' -> columna absoluta (en la hoja)."""
-    mapping: Dict[str, int] = {}
-    for idx, header in enumerate(info.headers):
-        mapping[str(header)] = info.min_col + idx
-    return mapping
+# ---------------------------------------------------------------
+# Internos de openpyxl: todo acceso privado (ws._cells, ws._add_cell, Cell._style) pasa
+# por estas 4 funciones. Verificado con openpyxl 3.1.5 (pyproject fija openpyxl<3.2).
+# ---------------------------------------------------------------
+def _existing_cell(ws, row: int, col: int) -> Cell | None:
+    """Celda (row, col) si ya existe; None si no (ws.cell la crearía vacía)."""
+    return ws._cells.get((row, col))
 
 
-def _copy_row_style(ws, src_row: int, dst_row: int, min_col: int, max_col: int) -> None:
-    """Copia estilo de una fila a otra para preservar formato visible."""
+def _new_cell(ws, row: int, col: int, value: Any) -> Cell:
+    """Crea la celda con el valor ya puesto y la registra (mismo camino que ws.append)."""
+    cell = Cell(ws, row=row, column=col, value=value)
+    ws._add_cell(cell)
+    return cell
+
+
+def _cell_style(cell: Cell) -> StyleArray:
+    """StyleArray de la celda (ids de font/border/fill/... del workbook)."""
+    return cell._style
+
+
+def _set_cell_style(cell: Cell, style: StyleArray) -> None:
+    # Copia obligatoria: openpyxl muta el StyleArray in-place al cambiar formatos
+    # (number_format, font, ...), así que compartir la referencia alteraría la celda
+    # fuente. StyleArray(style) es lo mismo que copy(style) sin pasar por el módulo copy.
+    cell._style = StyleArray(style)
+
+
+def _row_style_template(ws, src_row: int, min_col: int, max_col: int) -> List[Tuple[int, Any, Any]]:
+    """
+    Captura una sola vez el estilo de la fila fuente: [(col, StyleArray, comment), ...]
+    solo para las celdas con estilo.
+
+    El StyleArray ya contiene los ids de font/border/fill/alignment/protection/number_format
+    del mismo workbook, así que copiarlo basta para replicar todo el formato.
+    Se leen solo las celdas que ya existen (_existing_cell) para no materializar celdas vacías:
+    si la fila fuente no tiene estilo el template queda vacío y no se copia nada.
+    """
+    template: List[Tuple[int, Any, Any]] = []
     for col in range(min_col, max_col + 1):
-        src = ws.cell(row=src_row, column=col)
+        src = _existing_cell(ws, src_row, col)
+        if src is not None and src.has_style:
+            template.append((col, _cell_style(src), src.comment))
+    return template
+
+
+def _apply_row_style(ws, template: List[Tuple[int, Any, Any]], dst_row: int) -> None:
+    """Aplica un template de _row_style_template a dst_row."""
+    for col, style, comment in template:
         dst = ws.cell(row=dst_row, column=col)
-        if src.has_style:
-            dst._style = copy(src._style)
-            dst.number_format = src.number_format
-            dst.font = copy(src.font)
-            dst.border = copy(src.border)
-            dst.fill = copy(src.fill)
-            dst.alignment = copy(src.alignment)
-            dst.protection = copy(src.protection)
-            dst.comment = copy(src.comment) if src.comment else None
-
-
-def _set_cell_formats(ws, row: int, col_map: Dict[str, int]) -> None:
-    """
-    Aplica formatos específicos:
-    - Date: dd-mmm-yy
-    - Bill number: texto
-    - Números: 2 decimales
-    - CC/GL: enteros
-    """
-    if "Date" in col_map:
-        ws.cell(row=row, column=col_map["Date"]).number_format = "dd-mmm-yy"
-
-    if "Bill number" in col_map:
-        ws.cell(row=row, column=col_map["Bill number"]).number_format = "@"
-
-    # Texto: Bill number / FC/NC number / Affected invoice
-    for key in ["Bill number", "FC/NC number", "Affected invoice"]:
-        if key in col_map:
-            ws.cell(row=row, column=col_map[key]).number_format = "@"
-
-    # Números con 2 decimales (split + general registry)
-    for key in [
-        "Subtotal assigned by CC",
-        "% IVA",
-        "IVA assigned by CC",
-        "Total assigned by CC",
-        "Subtotal",
-        "IVA",
-        "Total",
-    ]:
-        if key in col_map:
-            ws.cell(row=row, column=col_map[key]).number_format = "#,##0.00"
+        _set_cell_style(dst, style)
+        dst.comment = copy(comment) if comment else None
 
-    # Enteros
-    for key in ["CC", "GL account"]:
-        if key in col_map:
-            ws.cell(row=row, column=col_map[key]).number_format = "0"
+
+def _final_row_template(
+    ws,
+    row: int,
+    style_template: List[Tuple[int, Any, Any]],
+    fmt_plan: List[Tuple[int, str]],
+) -> List[Tuple[int, Any, Any]]:
+    """
+    Captura el estilo ya aplicado (template fuente + formatos) de una fila recién
+    insertada, ANTES de escribir valores, para reutilizarlo en las filas siguientes.
+    Solo incluye las columnas que tocan el template fuente o el plan de formatos.
+    """
+    comments = {col: comment for col, _style, comment in style_template}
+    cols = sorted(comments.keys() | {col for col, _fmt in fmt_plan})
+    return [
+        (col, StyleArray(_cell_style(_existing_cell(ws, row, col))), comments.get(col))
+        for col in cols
+    ]
+
+
+def _copy_row_style(ws, src_row: int, dst_row: int, min_col: int, max_col: int) -> None:
+    """Copia estilo de una fila a otra para preservar formato visible."""
+    template = _row_style_template(ws, src_row, min_col, max_col)
+    if template:  # fila fuente sin estilo: nada que copiar
+        _apply_row_style(ws, template, dst_row)
+
+
+# Formatos específicos por header:
+# - Date: dd-mmm-yy
+# - Texto: Bill number / FC/NC number / Affected invoice
+# - Números con 2 decimales (split + general registry)
+# - Enteros: CC / GL account
+_NUMBER_FORMATS: Dict[str, str] = {
+    "Date": "dd-mmm-yy",
+    "Bill number": "@",
+    "FC/NC number": "@",
+    "Affected invoice": "@",
+    "Subtotal assigned by CC": "#,##0.00",
+    "% IVA": "#,##0.00",
+    "IVA assigned by CC": "#,##0.00",
+    "Total assigned by CC": "#,##0.00",
+    "Subtotal": "#,##0.00",
+    "IVA": "#,##0.00",
+    "Total": "#,##0.00",
+    "CC": "0",
+    "GL account": "0",
+}
+
+
+def _format_plan(col_map: Dict[str, int]) -> List[Tuple[int, str]]:
+    """Resuelve 1 vez por tabla qué columnas llevan formato: [(col, number_format)]."""
+    return [(col_map[key], fmt) for key, fmt in _NUMBER_FORMATS.items() if key in col_map]
+
+
+def _apply_formats(ws, row: int, plan: List[Tuple[int, str]]) -> None:
+    """Aplica el plan de formatos (ver _format_plan) a una fila."""
+    for col, fmt in plan:
+        ws.cell(row=row, column=col).number_format = fmt
 
 
 # -----------------------
 # Delete + Append
 # -----------------------
+def _column_values(ws, col: int, rows) -> List[Any]:
+    """
+    Valores de una columna para las filas dadas, leyendo solo celdas existentes
+    (_existing_cell): igual que un scan read-only, no crea celdas vacías.
+    """
+    return [c.value if (c := _existing_cell(ws, r, col)) is not None else None for r in rows]
+
+
+def _cell_text(value: Any) -> str:
+    """str(value) con fast path: columnas de texto ("@") casi siempre ya traen str."""
+    return value if type(value) is str else str(value)
+
+
+def _contiguous_runs(rows: List[int]) -> List[Tuple[int, int]]:
+    """Agrupa filas ordenadas ascendentemente en bloques (fila_inicio, cantidad)."""
+    runs: List[Tuple[int, int]] = []
+    for r in rows:
+        if runs and runs[-1][0] + runs[-1][1] == r:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((r, 1))
+    return runs
+
+
 def delete_duplicates_in_table(
     ws,
     info: TableInfo,
     vendor_id: int,
     bill_number: str,
     bill_col_name: str = "Bill number",
-) -> int:
+) -> Tuple[int, TableInfo]:
     """
     Borra filas dentro de la tabla donde:
       (ID == vendor_id) y (Bill number == bill_number)
 
     Duplicado definido por ti: SOLO vendor_id + bill_number (sin fecha).
     Además, ENCOGE el table.ref para evitar huecos.
+
+    Devuelve (filas_borradas, TableInfo actualizado) para no volver a buscar la tabla.
     """
-    col_map = _header_to_col_index(info)
+    col_map = info.col_map
 
     if "ID" not in col_map or bill_col_name not in col_map:
         raise ExcelWriteError(
@@ -399,47 +781,72 @@ def delete_duplicates_in_table(
         bill_number,
     )
 
-    rows_to_delete: List[int] = []
-    for r in range(info.min_row + 1, info.max_row + 1):
-        cell_id = ws.cell(row=r, column=id_col).value
-        cell_bill = ws.cell(row=r, column=bill_col).value
-        if cell_id == vendor_id and str(cell_bill).strip() == bill_number:
-            rows_to_delete.append(r)
+    # Leemos solo las 2 columnas clave, cada una en un único slice (sin materializar celdas):
+    # primero filtramos por ID (el caso común es que no coincida) y solo en esos
+    # candidatos comparamos el número de factura.
+    rows = range(info.min_row + 1, info.max_row + 1)
+    ids = _column_values(ws, id_col, rows)
+    candidates = [r for r, v in zip(rows, ids, strict=True) if v == vendor_id]
+    bills = _column_values(ws, bill_col, candidates)
+    rows_to_delete: List[int] = [
+        r for r, b in zip(candidates, bills, strict=True) if _cell_text(b).strip() == bill_number
+    ]
 
-    for r in reversed(rows_to_delete):
-        ws.delete_rows(r, 1)
+    # Borramos por bloques contiguos (1 delete_rows por bloque, de abajo hacia arriba):
+    # cada delete_rows desplaza todas las filas siguientes, así que menos llamadas = menos trabajo
+    for start, count in reversed(_contiguous_runs(rows_to_delete)):
+        ws.delete_rows(start, count)
 
     deleted = len(rows_to_delete)
 
     # CLAVE: encoger el rango de la tabla para evitar huecos
     if deleted > 0:
-        start_cell = f"{get_column_letter(info.min_col)}{info.min_row}"
         new_end_row = info.max_row - deleted
-        end_cell = f"{get_column_letter(info.max_col)}{new_end_row}"
-        ws.tables[info.table_name].ref = f"{start_cell}:{end_cell}"
+        ws.tables[info.table_name].ref = info.ref_to(new_end_row)
+        info = replace(info, max_row=new_end_row)
 
-    return deleted
+    return deleted, info
 
 
 def _is_row_empty(ws, row: int, min_col: int, max_col: int) -> bool:
+    # solo celdas existentes: no materializa celdas vacías
     for col in range(min_col, max_col + 1):
-        if ws.cell(row=row, column=col).value not in (None, ""):
+        c = _existing_cell(ws, row, col)
+        if c is not None and c.value not in (None, ""):
             return False
     return True
 
 
+def _resolve_columns(info: TableInfo, col_map: Dict[str, int], headers) -> List[int]:
+    """Columnas absolutas para una secuencia de headers; falla si alguno no existe."""
+    cols: List[int] = []
+    for header in headers:
+        if header not in col_map:
+            raise ExcelWriteError(
+                f"Columna '{header}' no existe en la tabla {info.table_name}. "
+                f"Headers disponibles: {info.headers}"
+            )
+        cols.append(col_map[header])
+    return cols
+
+
 def append_rows_to_table(ws, info: TableInfo, rows: List[Dict[str, Any]]) -> None:
     """Inserta filas al final de la tabla y expande table.ref.
     - Si la tabla recién se creó con ref ...:2 (fila 2 vacía), la primera inserción se escribe en fila 2.
     """
-    col_map = _header_to_col_index(info)
+    col_map = info.col_map
+    fmt_plan = _format_plan(col_map)
 
     # Determinar la primera fila de datos dentro de la tabla (normalmente row 2)
     first_data_row = info.min_row + 1
 
-    # Si la tabla fue creada con ref hasta row 2, y row 2 está vacía, empezamos ahí
-    if info.max_row >= first_data_row and _is_row_empty(
-        ws, first_data_row, info.min_col, info.max_col
+    # Si la tabla fue creada con ref hasta row 2, y row 2 está vacía, empezamos ahí.
+    # - fresh: recién creada en esta sesión -> fila 2 vacía sin necesidad de leerla
+    # - si no, solo puede ser el caso "...:2" cuando la tabla tiene 1 sola fila de cuerpo
+    #   (con más filas, empezar en la fila 2 pisaría los datos de las siguientes)
+    if info.fresh or (
+        info.max_row == first_data_row
+        and _is_row_empty(ws, first_data_row, info.min_col, info.max_col)
     ):
         insert_row = first_data_row
         last_data_row = first_data_row - 1  # todavía no hay data real
@@ -447,120 +854,185 @@ def append_rows_to_table(ws, info: TableInfo, rows: List[Dict[str, Any]]) -> Non
         insert_row = info.max_row + 1
         last_data_row = info.max_row
 
-    # Para tablas existentes con estilos, intentamos copiar estilo de la última fila de datos
-    # Para tablas nuevas (sin estilo), simplemente no copiamos.
-    def has_any_style(r: int) -> bool:
-        for c in range(info.min_col, info.max_col + 1):
-            if ws.cell(row=r, column=c).has_style:
-                return True
-        return False
-
-    style_source_row = (
-        last_data_row if last_data_row >= first_data_row and has_any_style(last_data_row) else None
+    # Para tablas existentes con estilos, copiamos el estilo de la última fila de datos.
+    # El template se captura 1 vez (no por fila insertada); para tablas nuevas (sin estilo)
+    # no copiamos nada: _apply_formats ya deja los formatos de cada fila.
+    style_template = (
+        _row_style_template(ws, last_data_row, info.min_col, info.max_col)
+        if last_data_row >= first_data_row
+        else []
     )
 
-    for row_values in rows:
-        new_row = insert_row
+    # Todas las filas de un split suelen traer los mismos headers: cacheamos sus columnas.
+    # (No usamos ws.append: escribe en ws.max_row + 1, que no tiene por qué ser el final
+    # de la tabla, p.ej. la fila 2 vacía de una tabla recién creada.)
+    cols_by_keys: Dict[Tuple[str, ...], List[int]] = {}
 
-        # copiar estilo solo si hay fuente válida (tablas existentes)
-        if style_source_row is not None:
-            _copy_row_style(ws, style_source_row, new_row, info.min_col, info.max_col)
+    # Estilo final de fila (estilo fuente + formatos): se arma en la 1ª fila insertada y
+    # las siguientes solo copian ese StyleArray, sin volver a asignar number_format.
+    row_template: List[Tuple[int, Any, Any]] | None = None
 
-        # escribir valores
-        for header, value in row_values.items():
-            if header not in col_map:
-                raise ExcelWriteError(
-                    f"Columna '{header}' no existe en la tabla {info.table_name}. "
-                    f"Headers disponibles: {info.headers}"
-                )
-            ws.cell(row=new_row, column=col_map[header], value=value)
+    for row_values in rows:
+        new_row = insert_row
 
-        # formatos (sí importa consistencia)
-        _set_cell_formats(ws, new_row, col_map)
+        if row_template is None:
+            # copiar estilo solo si hay fuente válida (tablas existentes)
+            if style_template:
+                _apply_row_style(ws, style_template, new_row)
+            # formatos (sí importa consistencia)
+            _apply_formats(ws, new_row, fmt_plan)
+            row_template = _final_row_template(ws, new_row, style_template, fmt_plan)
+        else:
+            _apply_row_style(ws, row_template, new_row)
+
+        # escribir valores (columnas resueltas 1 vez por combinación de headers)
+        keys = tuple(row_values)
+        cols = cols_by_keys.get(keys)
+        if cols is None:
+            cols = cols_by_keys[keys] = _resolve_columns(info, col_map, keys)
+        for col, value in zip(cols, row_values.values(), strict=True):
+            cell = _existing_cell(ws, new_row, col)
+            if cell is None:
+                _new_cell(ws, new_row, col, value)
+            else:
+                cell.value = value
 
         # avanzar punteros
         last_data_row = new_row
-        style_source_row = new_row if has_any_style(new_row) else style_source_row
         insert_row = new_row + 1
 
     # actualizar ref de la tabla (expandir hasta last_data_row)
-    start_cell = f"{get_column_letter(info.min_col)}{info.min_row}"
-    end_cell = f"{get_column_letter(info.max_col)}{last_data_row if last_data_row >= first_data_row else first_data_row}"
-    ws.tables[info.table_name].ref = f"{start_cell}:{end_cell}"
+    ws.tables[info.table_name].ref = info.ref_to(max(last_data_row, first_data_row))
 
 
 # -----------------------
 # Transaction (Backup por sesión + retención + logging)
 # -----------------------
-def apply_transaction(
+@dataclass(frozen=True, slots=True)
+class Transaction:
+    """Una factura a guardar: borra (vendor_id + bill_number) y agrega table_to_rows."""
+
+    vendor_id: int
+    bill_number: str
+    table_to_rows: Dict[str, List[Dict[str, Any]]]
+
+
+def _apply_one(wb, table_index: Dict[str, Any], tx: Transaction) -> Tuple[Dict[str, int], bool]:
+    """
+    Aplica una transacción sobre un workbook ya abierto (no hace backup ni guarda).
+    Devuelve (deleted_by_table, hubo_cambios).
+    """
+    changed = False
+    deleted_by_table: Dict[str, int] = {}
+
+    logger.info(
+        "TRANSACCION INICIO | vendor_id=%s | key_value=%s | tablas=%s",
+        tx.vendor_id,
+        tx.bill_number,
+        list(tx.table_to_rows.keys()),
+    )
+
+    for table_name, rows in tx.table_to_rows.items():
+        ws, info = find_table(wb, table_name, table_index)
+
+        bill_col = "FC/NC number" if table_name == "General_registry_table" else "Bill number"
+
+        # info ya viene refrescado tras borrar (sin volver a buscar la tabla)
+        deleted, info = delete_duplicates_in_table(
+            ws, info, tx.vendor_id, tx.bill_number, bill_col_name=bill_col
+        )
+
+        deleted_by_table[table_name] = deleted
+        changed = changed or deleted > 0 or bool(rows)
+
+        append_rows_to_table(ws, info, rows)
+
+        logger.info(
+            "TABLA ACTUALIZADA | tabla=%s | borradas=%s | insertadas=%s | clave=(ID + %s)",
+            table_name,
+            deleted,
+            len(rows),
+            bill_col,
+        )
+
+    return deleted_by_table, changed
+
+
+def _coalesce_transactions(transactions: List[Transaction]) -> List[Tuple[Transaction, int]]:
+    """
+    Fusiona transacciones CONSECUTIVAS con la misma clave (vendor_id + bill_number):
+    la posterior borraría igual lo que insertó la anterior, así que basta con una sola
+    pasada de borrado + inserción por tabla (por tabla gana la última transacción).
+    Devuelve [(transacción_fusionada, cantidad_de_originales)] en el mismo orden.
+    """
+    merged: List[Tuple[Transaction, int]] = []
+    for tx in transactions:
+        if merged:
+            prev, n = merged[-1]
+            if prev.vendor_id == tx.vendor_id and prev.bill_number == tx.bill_number:
+                merged[-1] = (
+                    replace(prev, table_to_rows={**prev.table_to_rows, **tx.table_to_rows}),
+                    n + 1,
+                )
+                continue
+        merged.append((tx, 1))
+    return merged
+
+
+def apply_transactions(
     excel_path: Path,
     backup_dir: Path,
-    vendor_id: int,
-    bill_number: str,
-    table_to_rows: Dict[str, List[Dict[str, Any]]],
+    transactions: List[Transaction],
     backup_path: Path | None = None,
     retention_keep_last_n: int = 30,
     retention_keep_days: int = 30,
-) -> Tuple[Path, Dict[str, int], bool]:
+) -> Tuple[Path | None, List[Dict[str, int]], bool]:
     """
-    Ejecuta un guardado completo (multi-tabla) con:
-    - Backup por sesión:
-        - Si backup_path es None -> crea backup (solo una vez por sesión) + aplica retención
-        - Si backup_path ya existe -> reutiliza, NO crea nuevo backup
+    Ejecuta varias transacciones (facturas) sobre el mismo Excel con:
     - Abre workbook 1 vez
-    - Por cada tabla destino:
+    - Transacciones consecutivas de la misma factura se fusionan (una sola pasada)
+    - Por cada transacción, por cada tabla destino:
         - borra duplicados por (vendor_id + bill_number) SOLO en esa tabla
         - inserta filas al final
-    - Guarda workbook 1 vez
+    - Backup por sesión (lazy: solo si hubo cambios, justo antes de guardar;
+      el archivo en disco sigue intacto hasta ese momento):
+        - Si backup_path es None -> crea backup (solo una vez por sesión) + aplica retención
+        - Si backup_path ya existe -> reutiliza, NO crea nuevo backup
+    - Guarda workbook 1 vez (si no hubo cambios no se hace backup ni se guarda)
 
     Devuelve:
-      (backup_path_usado, deleted_by_table, backup_creado_esta_vez)
+      (backup_path_usado, deleted_by_table por transacción, backup_creado_esta_vez)
+      backup_path_usado puede ser None si no hubo cambios y no había backup de sesión.
     """
     backup_created = False
-
-    # Backup por sesión
-    if backup_path is None or not Path(backup_path).exists():
-        backup_path = backup_excel(excel_path, backup_dir)
-        backup_created = True
-        prune_backups(backup_dir, keep_last_n=retention_keep_last_n, keep_days=retention_keep_days)
-
     wb = open_workbook_safe(excel_path)
-    deleted_by_table: Dict[str, int] = {}
-
-    logger.info(
-        "TRANSACCION INICIO | excel=%s | vendor_id=%s | key_value=%s | tablas=%s",
-        excel_path,
-        vendor_id,
-        bill_number,
-        list(table_to_rows.keys()),
-    )
+    changed = False
+    results: List[Dict[str, int]] = []
+    tx: Transaction | None = None
 
     try:
-        for table_name, rows in table_to_rows.items():
-            ws, info = find_table(wb, table_name)
-
-            bill_col = "FC/NC number" if table_name == "General_registry_table" else "Bill number"
-
-            deleted = delete_duplicates_in_table(
-                ws, info, vendor_id, bill_number, bill_col_name=bill_col
-            )
-
-            deleted_by_table[table_name] = deleted
-
-            # refrescar info después de borrar
-            ws, info = find_table(wb, table_name)
-            append_rows_to_table(ws, info, rows)
-
+        table_index = build_table_index(wb)
+        for tx, n in _coalesce_transactions(transactions):
+            deleted_by_table, tx_changed = _apply_one(wb, table_index, tx)
+            # Una entrada por transacción original (las fusionadas comparten resultado)
+            results.extend([deleted_by_table] * n)
+            changed = changed or tx_changed
+
+        if not changed:
             logger.info(
-                "TABLA ACTUALIZADA | tabla=%s | borradas=%s | insertadas=%s | clave=(ID + %s)",
-                table_name,
-                deleted,
-                len(rows),
-                bill_col,
+                "TRANSACCION SIN CAMBIOS | excel=%s | transacciones=%s",
+                excel_path,
+                len(results),
             )
+            return (Path(backup_path) if backup_path else None), results, False
+
+        # Backup por sesión: el original se enlaza al backup al guardar (sin copia extra)
+        new_backup = None
+        if backup_path is None or not os.path.exists(backup_path):
+            new_backup = backup_path_for(excel_path, backup_dir)
 
         try:
-            wb.save(excel_path)
+            save_workbook_atomic(wb, excel_path, backup_to=new_backup)
         except PermissionError as e:
             logger.error("ERROR GUARDADO (archivo bloqueado) | %s", e)
             raise ExcelWriteError(
@@ -568,24 +1040,59 @@ def apply_transaction(
                 "Cierra el archivo y vuelve a intentar."
             ) from e
 
-        logger.info(
-            "TRANSACCION OK | excel=%s | vendor_id=%s | bill=%s | borradas_por_tabla=%s",
-            excel_path,
-            vendor_id,
-            bill_number,
-            deleted_by_table,
-        )
+        if new_backup is not None:
+            backup_path = new_backup
+            backup_created = True
+            prune_backups(
+                backup_dir, keep_last_n=retention_keep_last_n, keep_days=retention_keep_days
+            )
+
+        for tx, deleted_by_table in zip(transactions, results, strict=True):
+            logger.info(
+                "TRANSACCION OK | excel=%s | vendor_id=%s | bill=%s | borradas_por_tabla=%s",
+                excel_path,
+                tx.vendor_id,
+                tx.bill_number,
+                deleted_by_table,
+            )
 
     except Exception as e:
         logger.exception(
             "ERROR TRANSACCION | excel=%s | vendor_id=%s | bill=%s | %s",
             excel_path,
-            vendor_id,
-            bill_number,
+            tx.vendor_id if tx else None,
+            tx.bill_number if tx else None,
             e,
         )
         raise
     finally:
         wb.close()
 
-    return Path(backup_path), deleted_by_table, backup_created
+    return Path(backup_path), results, backup_created
+
+
+def apply_transaction(
+    excel_path: Path,
+    backup_dir: Path,
+    vendor_id: int,
+    bill_number: str,
+    table_to_rows: Dict[str, List[Dict[str, Any]]],
+    backup_path: Path | None = None,
+    retention_keep_last_n: int = 30,
+    retention_keep_days: int = 30,
+) -> Tuple[Path | None, Dict[str, int], bool]:
+    """
+    Guardado de una sola factura (ver apply_transactions).
+
+    Devuelve:
+      (backup_path_usado, deleted_by_table, backup_creado_esta_vez)
+    """
+    backup_path, results, backup_created = apply_transactions(
+        excel_path,
+        backup_dir,
+        [Transaction(vendor_id, bill_number, table_to_rows)],
+        backup_path=backup_path,
+        retention_keep_last_n=retention_keep_last_n,
+        retention_keep_days=retention_keep_days,
+    )
+    return backup_path, results[0], backup_created
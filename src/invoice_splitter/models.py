@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date
 from decimal import Decimal
 from typing import Any, Dict, List, Optional, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Allocation(BaseModel):
@@ -16,6 +17,9 @@ class Allocation(BaseModel):
     - amount: valor directo (Decimal)                      [modo 'amount']
     """
 
+    # inmutable: las reglas solo la leen (para cambiar un split se crea una nueva)
+    model_config = ConfigDict(frozen=True)
+
     concept: Optional[str] = None
     cc: int
     gl_account: int
@@ -24,6 +28,8 @@ class Allocation(BaseModel):
 
 
 class InvoiceInput(BaseModel):
+    # NO es frozen: la UI completa service_type / service_concept / allocations
+    # sobre la misma instancia antes de llamar a build_lines.
     invoice_date: date
     vendor_id: int
     vendor_name: str
@@ -45,11 +51,15 @@ class InvoiceInput(BaseModel):
     allocations: List[Allocation] = Field(default_factory=list)
 
 
-class LineItem(BaseModel):
+@dataclass(frozen=True, slots=True)
+class LineItem:
     """
     Una fila que será insertada en una Excel Table específica.
     `table_name` es el nombre exacto del ListObject (ej: 'Eikon_table').
     `values` es un dict: 'Nombre columna Excel' -> valor
+
+    Dataclass (no pydantic): la arman solo las reglas con datos ya validados,
+    así que no hace falta re-validar (ni copiar) el dict de cada línea.
     """
 
     table_name: str
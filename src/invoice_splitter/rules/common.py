@@ -1,28 +1,137 @@
 from __future__ import annotations
 
+import sys
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List, Tuple
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from invoice_splitter.models import Allocation
+from invoice_splitter.models import Allocation, InvoiceInput, LineItem
 
 TWOPLACES = Decimal("0.01")
 TOLERANCE = Decimal("0.01")
+_ONE = Decimal(1)
+_ZERO = Decimal("0")
+_ALLOC_FIELDS = attrgetter("concept", "cc", "gl_account")
+
+# Columnas comunes a todas las tablas, en el orden de la tabla Excel.
+# Internadas: todas las plantillas (y line_base) usan el mismo objeto str por clave.
+LINE_COLUMNS: Tuple[str, ...] = tuple(
+    map(
+        sys.intern,
+        (
+            "Date",
+            "Bill number",
+            "ID",
+            "Vendor",
+            "Service/ concept",
+            "CC",
+            "GL account",
+            "Subtotal assigned by CC",
+            "% IVA",
+            "IVA assigned by CC",
+            "Total assigned by CC",
+        ),
+    )
+)
 
 
 def q2(value) -> Decimal:
     """Redondea a 2 decimales con HALF_UP. Acepta Decimal/int/float/str."""
     if value is None:
-        value = Decimal("0")
+        value = _ZERO
     if not isinstance(value, Decimal):
         value = Decimal(str(value))
-    return value.quantize(TWOPLACES, rounding=ROUND_HALF_UP)
+    return value.quantize(TWOPLACES, ROUND_HALF_UP)
 
 
 def calc_iva_and_total(subtotal: Decimal, iva_rate: Decimal) -> tuple[Decimal, Decimal]:
-    """Calcula IVA y Total con redondeo a 2 decimales."""
-    iva = q2(subtotal * iva_rate)
-    total = q2(subtotal + iva)
-    return iva, total
+    """
+    Calcula IVA y Total con redondeo a 2 decimales.
+    Precondición: subtotal ya viene a 2 decimales (input del usuario ya redondeado o
+    montos de split), así que subtotal + iva es exacto y no necesita un 2do quantize.
+    Con más decimales el total saldría sin redondear (ej: 1872.301): se valida con assert.
+    """
+    assert subtotal.as_tuple().exponent >= -2 or subtotal == q2(
+        subtotal
+    ), f"calc_iva_and_total: subtotal debe venir a 2 decimales (recibido {subtotal})"
+    # rounding posicional: en el decimal de C el keyword cuesta ~2x en quantize
+    iva = (subtotal * iva_rate).quantize(TWOPLACES, ROUND_HALF_UP)
+    return iva, subtotal + iva
+
+
+def line_template(*extra_columns: str) -> Dict[str, Any]:
+    """Plantilla de columnas (todas en None): LINE_COLUMNS + las propias de la tabla."""
+    return dict.fromkeys((*LINE_COLUMNS, *map(sys.intern, extra_columns)))
+
+
+def line_base(template: Dict[str, Any], invoice: InvoiceInput) -> Dict[str, Any]:
+    """
+    Copia de la plantilla de columnas con los campos fijos de la factura ya escritos
+    (fecha, bill number, ID, vendor, % IVA). Se arma 1 vez por factura y cada línea
+    la copia y completa solo lo que cambia.
+    """
+    base = template.copy()
+    base["Date"] = invoice.invoice_date  # fecha real
+    base["Bill number"] = invoice.bill_number  # texto 9 dígitos
+    base["ID"] = invoice.vendor_id
+    base["Vendor"] = invoice.vendor_name
+    base["% IVA"] = invoice.iva_rate
+    return base
+
+
+def make_line(
+    table_name: str,
+    base: Dict[str, Any],
+    concept: str,
+    cc: int,
+    gl: int,
+    subtotal_assigned: Decimal,
+    iva_rate: Decimal,
+) -> LineItem:
+    """
+    Fila estándar (columnas de LINE_COLUMNS) con IVA/Total calculados.
+    Copia la base de la factura (line_base) y completa solo lo que cambia por línea;
+    las reglas la atan a su tabla con functools.partial(make_line, TABLA).
+    """
+    iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
+    v = base.copy()
+    v["Service/ concept"] = concept
+    v["CC"] = cc
+    v["GL account"] = gl
+    v["Subtotal assigned by CC"] = subtotal_assigned
+    v["IVA assigned by CC"] = iva
+    v["Total assigned by CC"] = total
+    return LineItem(table_name=table_name, values=v)
+
+
+def to_cents(amount: Decimal) -> int:
+    """Monto -> centavos enteros (HALF_UP, igual que q2)."""
+    return int((amount * 100).quantize(_ONE, ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    """Centavos enteros -> Decimal con 2 decimales (mismo resultado que q2)."""
+    # int * 0.01 es exacto y más barato que scaleb(-2)
+    return Decimal(cents) * TWOPLACES
+
+
+def split_cents(cents: int, bps: Sequence[int]) -> List[int]:
+    """
+    Reparte `cents` según porcentajes en puntos básicos (10000 = 100%), solo con int.
+    Cada parte se redondea HALF_UP (como q2) y la ÚLTIMA recibe el resto,
+    así la suma cierra exacto sin pasada de ajuste.
+    """
+    # HALF_UP sobre el valor absoluto: (n * bp + 5000) // 10000, y después el signo
+    sign = -1 if cents < 0 else 1
+    n = cents * sign
+    parts: List[int] = []
+    rest = cents
+    for bp in bps[:-1]:
+        part = (n * bp + 5000) // 10000 * sign
+        parts.append(part)
+        rest -= part
+    parts.append(rest)
+    return parts
 
 
 def parse_percent_value(raw: str | None) -> Decimal:
@@ -32,14 +141,14 @@ def parse_percent_value(raw: str | None) -> Decimal:
     Vacío -> 0.00
     """
     if raw is None:
-        return Decimal("0")
+        return _ZERO
     s = str(raw).strip()
     if not s:
-        return Decimal("0")
+        return _ZERO
     s = s.replace("%", "").strip()
     # permitimos coma/punto en UI; aquí asumimos que ya viene normalizado o bien con '.'
     s = s.replace(",", ".")
-    return q2(Decimal(s))
+    return Decimal(s).quantize(TWOPLACES, ROUND_HALF_UP)
 
 
 def validate_and_compute_allocations(
@@ -65,32 +174,66 @@ def validate_and_compute_allocations(
     if not allocations:
         raise ValueError("No hay líneas de split para calcular.")
 
-    amounts: List[Decimal] = []
+    # Todo el cuadre se hace en centavos enteros: cada monto se redondea 1 sola vez
+    # (HALF_UP, igual que q2) y sumas / diferencia / ajuste son aritmética de int.
+    cents: List[int] = []
 
     if mode == "percent":
         for a in allocations:
-            pct = a.percent if a.percent is not None else Decimal("0")
+            pct = a.percent if a.percent is not None else 0
             # pct es 0..100 (si el usuario pone 120, lo dejamos pasar pero la validación fallará normalmente)
-            amt = q2(subtotal * pct / Decimal("100"))
-            amounts.append(amt)
+            # subtotal * pct / 100 en centavos == subtotal * pct
+            cents.append(int((subtotal * pct).quantize(_ONE, ROUND_HALF_UP)))
 
     else:  # amount
         for a in allocations:
-            amt = a.amount if a.amount is not None else Decimal("0")
-            amounts.append(q2(amt))
+            amt = a.amount if a.amount is not None else 0
+            if not isinstance(amt, Decimal):
+                amt = Decimal(str(amt))
+            cents.append(int((amt * 100).quantize(_ONE, ROUND_HALF_UP)))
 
-    total = q2(sum(amounts))
-    diff = q2(subtotal - total)
+    total_cents = sum(cents)
+    diff_cents = int((subtotal * 100 - total_cents).quantize(_ONE, ROUND_HALF_UP))
 
     # Validación fuerte: si supera tolerancia, error.
-    if diff.copy_abs() > tolerance:
+    if abs(diff_cents) > tolerance * 100:
         raise ValueError(
-            f"La suma de líneas ({total}) no coincide con el subtotal ({subtotal}). "
-            f"Diferencia={diff}. Debes corregir valores/porcentajes."
+            f"La suma de líneas ({Decimal(total_cents).scaleb(-2)}) no coincide con el subtotal ({subtotal}). "
+            f"Diferencia={Decimal(diff_cents).scaleb(-2)}. Debes corregir valores/porcentajes."
         )
 
     # Ajuste permitido dentro de tolerancia
-    if diff != Decimal("0"):
-        amounts[-1] = q2(amounts[-1] + diff)
+    if diff_cents:
+        cents[-1] += diff_cents
+
+    return [(a, from_cents(c)) for a, c in zip(allocations, cents, strict=True)]
+
 
-    return list(zip(allocations, amounts))
+def custom_split_rows(
+    invoice: InvoiceInput,
+) -> Optional[List[Tuple[Optional[str], int, int, Decimal]]]:
+    """
+    Split custom de la factura ya validado: [(concept, cc, gl_account, monto)].
+    None si la factura no trae split (modo + líneas); así cada regla resuelve
+    el camino custom con 1 sola llamada.
+    """
+    mode = invoice.alloc_mode
+    allocations = invoice.allocations
+    if not (mode and allocations):
+        return None
+    pairs = validate_and_compute_allocations(invoice.subtotal, mode, allocations)
+    # Proyección de los 3 campos con attrgetter (en C) en vez de 3 lecturas por línea
+    return [(*_ALLOC_FIELDS(alloc), amount) for alloc, amount in pairs]
+
+
+def custom_cc_gl(invoice: InvoiceInput, error_msg: str) -> Tuple[int, int]:
+    """
+    CC/GL que ingresó el usuario (extras 'cc' y 'gl_account') para el camino custom sin split,
+    ya como int. Si falta alguno levanta ValueError(error_msg).
+    """
+    extras = invoice.extras
+    cc = extras.get("cc")
+    gl = extras.get("gl_account")
+    if cc is None or gl is None:
+        raise ValueError(error_msg)
+    return int(cc), int(gl)
@@ -1,86 +1,96 @@
 from __future__ import annotations
 
 import importlib
-import pkgutil
-from typing import Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.vendor_generic import build_lines_generic
 
 RuleFn = Callable[[InvoiceInput], List[LineItem]]
 
-# Cache global (se inicializa una sola vez)
-_RULES_CACHE: Optional[Dict[int, RuleFn]] = None
+# Registro explícito vendor_id -> módulo con la regla.
+# Cada módulo debe exponer:
+#   - VENDOR_ID (int), igual a la clave aquí
+#   - build_lines_for_vendor(invoice) -> list[LineItem]
+# Al agregar un vendor_*.py nuevo hay que registrarlo aquí (ya no se descubre con pkgutil).
+_RULE_MODULES: Dict[int, str] = {
+    1254902: "invoice_splitter.rules.vendor_1254902_claro",
+    1254926: "invoice_splitter.rules.vendor_1254926_cirion",
+    1255036: "invoice_splitter.rules.vendor_1255036_akros",
+    1255097: "invoice_splitter.rules.vendor_1255097_eikon",
+    1260177: "invoice_splitter.rules.vendor_1260177_movistar",
+    1261182: "invoice_splitter.rules.vendor_1261182_puntonet",
+    1274957: "invoice_splitter.rules.vendor_1274957_sipbox",
+    9999999: "invoice_splitter.rules.vendor_9999999_dummy",
+}
+
+# Módulo de la regla genérica (vendors sin regla específica)
+_GENERIC_MODULE = "invoice_splitter.rules.vendor_generic"
+
+# Cache de reglas ya importadas (cada módulo se importa recién cuando se usa su vendor;
+# los vendors sin regla específica quedan apuntando a la regla genérica)
+_RULES_CACHE: Dict[int, RuleFn] = {}
+
+
+def _load_rule(vendor_id: int, module_name: str) -> RuleFn:
+    """Importa el módulo de un vendor y valida que exponga la regla esperada."""
+    mod = importlib.import_module(module_name)
+
+    fn = getattr(mod, "build_lines_for_vendor", None)
+    if getattr(mod, "VENDOR_ID", None) != vendor_id or not callable(fn):
+        raise ValueError(
+            f"El módulo {module_name} no define VENDOR_ID={vendor_id} "
+            "y/o build_lines_for_vendor(invoice)."
+        )
+    return fn
+
+
+def _rule_for(vendor_id: int) -> RuleFn:
+    fn = _RULES_CACHE.get(vendor_id)
+    if fn is None:
+        module_name = _RULE_MODULES.get(vendor_id)
+        if module_name is None:
+            # Fallback genérico para vendors sin regla específica
+            fn = importlib.import_module(_GENERIC_MODULE).build_lines_generic
+        else:
+            fn = _load_rule(vendor_id, module_name)
+        _RULES_CACHE[vendor_id] = fn
+    return fn
 
 
-def _discover_vendor_modules() -> List[str]:
-    """
-    Retorna la lista de módulos dentro de invoice_splitter.rules cuyo nombre empieza por 'vendor_'.
-    Ej: invoice_splitter.rules.vendor_1255097_eikon
-    """
-    import invoice_splitter.rules as rules_pkg
-
-    module_names: List[str] = []
-    for m in pkgutil.iter_modules(rules_pkg.__path__):
-        if m.name.startswith("vendor_"):
-            module_names.append(f"{rules_pkg.__name__}.{m.name}")
-    return module_names
+def build_lines(invoice: InvoiceInput) -> List[LineItem]:
+    return _rule_for(invoice.vendor_id)(invoice)
 
 
-def _load_rules() -> Dict[int, RuleFn]:
+def build_lines_batch(invoices: Iterable[InvoiceInput]) -> List[LineItem]:
     """
-    Carga dinámicamente módulos vendor_*.py.
-    Cada módulo debe exponer:
-      - VENDOR_ID (int)
-      - build_lines_for_vendor(invoice) -> list[LineItem]
-    """
-    rules: Dict[int, RuleFn] = {}
-
-    for module_name in _discover_vendor_modules():
-        mod = importlib.import_module(module_name)
-
-        vendor_id = getattr(mod, "VENDOR_ID", None)
-        fn = getattr(mod, "build_lines_for_vendor", None)
-
-        # Validaciones defensivas
-        if not isinstance(vendor_id, int):
-            # No hacemos crash total: solo ignoramos módulo inválido
-            continue
-        if not callable(fn):
-            continue
+    Único punto de entrada para varias facturas de una vez (ej. carga masiva / cierre de mes),
+    de cualquier vendor. Devuelve una lista plana de LineItem: las líneas de cada factura
+    en el orden de entrada (igual que build_lines, una factura detrás de otra).
+    Para agrupar por tabla destino usar rows_by_table.
 
-        # Si hay duplicados de vendor_id, fallamos temprano (mejor que comportamiento ambiguo)
-        if vendor_id in rules:
-            raise ValueError(
-                f"Vendor ID duplicado detectado ({vendor_id}). "
-                f"Revisa los módulos vendor_*.py. Duplicado al cargar: {module_name}"
-            )
-
-        rules[vendor_id] = fn
-
-    return rules
-
-
-def _get_rules() -> Dict[int, RuleFn]:
-    global _RULES_CACHE
-    if _RULES_CACHE is None:
-        _RULES_CACHE = _load_rules()
-    return _RULES_CACHE
+    La regla de cada vendor se importa 1 sola vez (_RULES_CACHE). Cada factura tarda
+    microsegundos: repartirlas en procesos costaría más en serializar que en calcular.
+    """
+    lines: List[LineItem] = []
+    for invoice in invoices:
+        lines.extend(_rule_for(invoice.vendor_id)(invoice))
+    return lines
 
 
-def build_lines(invoice: InvoiceInput) -> List[LineItem]:
-    rules = _get_rules()
-    fn = rules.get(invoice.vendor_id)
-    if not fn:
-        # Fallback genérico para vendors sin regla específica
-        return build_lines_generic(invoice)
-    return fn(invoice)
+def rows_by_table(lines: Iterable[LineItem]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Agrupa líneas por tabla destino ({table_name: [values, ...]}), manteniendo el orden,
+    que es lo que consumen append_rows_to_table / Transaction.
+    """
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for li in lines:
+        rows.setdefault(li.table_name, []).append(li.values)
+    return rows
 
 
 def reload_rules() -> None:
     """
-    Útil en desarrollo si agregas módulos sin reiniciar el proceso.
+    Útil en desarrollo: descarta las reglas ya importadas (se vuelven a resolver al usarlas).
     En producción normalmente no lo necesitas.
     """
-    global _RULES_CACHE
-    _RULES_CACHE = None
+    _RULES_CACHE.clear()
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import List
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, q2, validate_and_compute_allocations
-
+from invoice_splitter.rules.common import (
+    calc_iva_and_total,
+    custom_cc_gl,
+    custom_split_rows,
+    from_cents,
+    line_base,
+    line_template,
+    split_cents,
+    to_cents,
+)
 
 VENDOR_ID = 1254902
 
@@ -46,6 +55,8 @@ MOBILE_SPLIT = [
     (3941036, 3649000000, Decimal("28.41")),
     (7475036, 4649000000, Decimal("15.05")),
 ]
+# Mismos % en puntos básicos (10000 = 100%) para repartir en centavos enteros
+MOBILE_SPLIT_BP = tuple(int(pct * 100) for _cc, _gl, pct in MOBILE_SPLIT)
 
 # ---------------------------
 # Claro SBC: split estándar 60/40
@@ -54,6 +65,7 @@ SBC_SPLIT = [
     (7475036, 7648100000, Decimal("60.00")),
     (3941036, 3648000000, Decimal("40.00")),
 ]
+SBC_SPLIT_BP = tuple(int(pct * 100) for _cc, _gl, pct in SBC_SPLIT)
 
 # ---------------------------
 # Claro Siptrunk: 7 líneas
@@ -65,6 +77,10 @@ SIPTRUNK_FIXED_LINES_ABS = [
     ("CONECEL (Internet 50 Mbps) - SD WAN", 7475036, 7418000000, Decimal("300.00")),
     ("CONECEL (Internet 50 Mbps) - SD WAN", 3941036, 3526400000, Decimal("200.00")),
 ]
+# Variantes con signo ya armadas (positivo / negativo) y su total en centavos
+_SIPTRUNK_FIXED_POS = [(cpt, cc, gl, abs(amt)) for cpt, cc, gl, amt in SIPTRUNK_FIXED_LINES_ABS]
+_SIPTRUNK_FIXED_NEG = [(cpt, cc, gl, -abs(amt)) for cpt, cc, gl, amt in SIPTRUNK_FIXED_LINES_ABS]
+_SIPTRUNK_FIXED_CENTS = sum(to_cents(amt) for _cpt, _cc, _gl, amt in _SIPTRUNK_FIXED_POS)
 
 SIPTRUNK_VARIABLE_LINES = [
     ("Consumos SIP Trunk - Claro ECUADOR", 7000036, 7648100000, Decimal("37.00")),
@@ -73,6 +89,7 @@ SIPTRUNK_VARIABLE_LINES = [
     ("Consumos SIP Trunk - Claro ECUADOR", 3941036, 3648000000, Decimal("15.00")),
     ("Consumos SIP Trunk - Claro ECUADOR", 7475036, 7648100000, Decimal("5.00")),
 ]
+SIPTRUNK_VARIABLE_BP = tuple(int(pct * 100) for _cpt, _cc, _gl, pct in SIPTRUNK_VARIABLE_LINES)
 
 
 def build_lines_for_claro(invoice: InvoiceInput) -> List[LineItem]:
@@ -81,15 +98,12 @@ def build_lines_for_claro(invoice: InvoiceInput) -> List[LineItem]:
     invoice.service_type: 'siptrunk' | 'sbc' | 'mobile'
     """
     service_type = (invoice.service_type or "").strip().lower()
-    if service_type not in {"siptrunk", "sbc", "mobile"}:
+    builder = _BUILDERS_BY_SERVICE.get(service_type)
+    if builder is None:
         raise ValueError(
             "Para CLARO debes seleccionar el tipo de servicio: Siptrunk, SBC o Mobile."
         )
-    if service_type == "siptrunk":
-        return _build_siptrunk(invoice)
-    if service_type == "sbc":
-        return _build_sbc(invoice)
-    return _build_mobile(invoice)
+    return builder(invoice)
 
 
 # ---------------------------
@@ -107,49 +121,27 @@ def _build_siptrunk(invoice: InvoiceInput) -> List[LineItem]:
     if concept == OTRO:
         return _build_custom_into_siptrunk_table(invoice, bw, channels)
 
-    # ✅ Signo correcto: positivo si subtotal >= 0, negativo si subtotal < 0
-    sign = Decimal("-1") if invoice.subtotal < 0 else Decimal("1")
-
-    lines: List[LineItem] = []
-
-    # 2 fijas con signo (si subtotal negativo => -300 y -200)
-    fixed_amounts: List[Decimal] = []
-    for cpt, cc, gl, abs_amt in SIPTRUNK_FIXED_LINES_ABS:
-        amt = q2(abs(abs_amt) * sign)
-        fixed_amounts.append(amt)
-        lines.append(_make_siptrunk_line(invoice, cpt, cc, gl, amt, iva_rate, bw, channels))
+    base = line_base(_SIPTRUNK_TEMPLATE, invoice)
 
-    fixed_total = q2(sum(fixed_amounts))
-
-    # Base restante para las 5 variables
-    base = q2(invoice.subtotal - fixed_total)
-
-    # 5 variables por % (suman 100)
-    variable_amounts: List[Decimal] = []
-    for _cpt, _cc, _gl, pct in SIPTRUNK_VARIABLE_LINES:
-        variable_amounts.append(q2(base * (pct / Decimal("100"))))
-
-    # Ajuste por redondeo para que sum(variable_amounts) == base
-    diff = q2(base - sum(variable_amounts))
-    if diff != 0:
-        variable_amounts[-1] = q2(variable_amounts[-1] + diff)
+    # ✅ Signo correcto: positivo si subtotal >= 0, negativo si subtotal < 0
+    # (si subtotal negativo => fijas -300 y -200)
+    if invoice.subtotal < 0:
+        fixed, fixed_cents = _SIPTRUNK_FIXED_NEG, -_SIPTRUNK_FIXED_CENTS
+    else:
+        fixed, fixed_cents = _SIPTRUNK_FIXED_POS, _SIPTRUNK_FIXED_CENTS
+
+    lines: List[LineItem] = [
+        _make_siptrunk_line(base, cpt, cc, gl, amt, iva_rate, bw, channels)
+        for cpt, cc, gl, amt in fixed
+    ]
 
-    for idx, (cpt, cc, gl, _pct) in enumerate(SIPTRUNK_VARIABLE_LINES):
-        lines.append(
-            _make_siptrunk_line(invoice, cpt, cc, gl, variable_amounts[idx], iva_rate, bw, channels)
-        )
+    # 5 variables por % (suman 100) sobre la base restante, en centavos enteros:
+    # la última recibe el resto, así el total cierra exacto con el subtotal
+    base_cents = to_cents(invoice.subtotal) - fixed_cents
+    variable_cents = split_cents(base_cents, SIPTRUNK_VARIABLE_BP)
 
-    # ✅ Garantía final (cierre exacto subtotal)
-    total_assigned = q2(sum(Decimal(str(li.values["Subtotal assigned by CC"])) for li in lines))
-    final_diff = q2(invoice.subtotal - total_assigned)
-    if final_diff != 0:
-        last = lines[-1]
-        last.values["Subtotal assigned by CC"] = q2(
-            Decimal(str(last.values["Subtotal assigned by CC"])) + final_diff
-        )
-        iva, total = calc_iva_and_total(last.values["Subtotal assigned by CC"], iva_rate)
-        last.values["IVA assigned by CC"] = iva
-        last.values["Total assigned by CC"] = total
+    for (cpt, cc, gl, _pct), c in zip(SIPTRUNK_VARIABLE_LINES, variable_cents, strict=True):
+        lines.append(_make_siptrunk_line(base, cpt, cc, gl, from_cents(c), iva_rate, bw, channels))
 
     return lines
 
@@ -161,38 +153,40 @@ def _build_custom_into_siptrunk_table(
     concept_general = (
         invoice.extras.get("custom_concept") or ""
     ).strip() or "Claro Siptrunk - Custom"
+    base = line_base(_SIPTRUNK_TEMPLATE, invoice)
 
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         return [
             _make_siptrunk_line(
-                invoice,
-                (alloc.concept or concept_general).strip(),
-                alloc.cc,
-                alloc.gl_account,
+                base,
+                alloc_concept.strip() if alloc_concept else concept_general,
+                cc,
+                gl,
                 amount,
                 iva_rate,
                 bw,
                 channels,
             )
-            for alloc, amount in pairs
+            for alloc_concept, cc, gl, amount in rows
         ]
 
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para Siptrunk personalizado sin split debes ingresar CC y GL account.")
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para Siptrunk personalizado sin split debes ingresar CC y GL account.",
+    )
     return [
-        _make_siptrunk_line(
-            invoice, concept_general, int(cc), int(gl), invoice.subtotal, iva_rate, bw, channels
-        )
+        _make_siptrunk_line(base, concept_general, cc, gl, invoice.subtotal, iva_rate, bw, channels)
     ]
 
 
+# Columnas de SIPTRUNK_TABLE: line_base la copia 1 vez por factura (más barato que armar
+# el dict literal en cada línea) y cada línea completa solo lo que cambia
+_SIPTRUNK_TEMPLATE = line_template("Bandwidth (MBPS)", "Troncal SIP (channels)")
+
+
 def _make_siptrunk_line(
-    invoice: InvoiceInput,
+    base: Dict[str, Any],
     concept: str,
     cc: int,
     gl: int,
@@ -202,29 +196,27 @@ def _make_siptrunk_line(
     sip_channels: int,
 ) -> LineItem:
     iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=SIPTRUNK_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-            "Bandwidth (MBPS)": int(bandwidth_mbps),
-            "Troncal SIP (channels)": int(sip_channels),
-        },
-    )
+    v = base.copy()
+    v["Service/ concept"] = concept
+    v["CC"] = cc
+    v["GL account"] = gl
+    v["Subtotal assigned by CC"] = subtotal_assigned
+    v["IVA assigned by CC"] = iva
+    v["Total assigned by CC"] = total
+    v["Bandwidth (MBPS)"] = bandwidth_mbps
+    v["Troncal SIP (channels)"] = sip_channels
+    return LineItem(table_name=SIPTRUNK_TABLE, values=v)
 
 
 # ---------------------------
 # SBC
 # ---------------------------
+@lru_cache(maxsize=128)
+def _to_dec(raw) -> Decimal:
+    """Precio (str/int/float) -> Decimal. Casi siempre son los mismos pocos valores."""
+    return Decimal(str(raw))
+
+
 def _build_sbc(invoice: InvoiceInput) -> List[LineItem]:
     iva_rate = invoice.iva_rate
     concept = (invoice.service_concept or "").strip() or SBC_DEFAULT_CONCEPT
@@ -234,128 +226,97 @@ def _build_sbc(invoice: InvoiceInput) -> List[LineItem]:
     sip_mbps = int(invoice.extras.get("sbc_siptrunk_mbps", SBC_DEFAULT_SIPTRUNK_MBPS))
     lic_qty = int(invoice.extras.get("sbc_lic_qty", SBC_DEFAULT_LIC_QTY))
 
-    sip_price = Decimal(str(invoice.extras.get("sbc_siptrunk_price", SBC_DEFAULT_SIPTRUNK_PRICE)))
-    lic_price = Decimal(str(invoice.extras.get("sbc_lic_price", SBC_DEFAULT_LIC_PRICE)))
+    sip_price = _to_dec(invoice.extras.get("sbc_siptrunk_price", SBC_DEFAULT_SIPTRUNK_PRICE))
+    lic_price = _to_dec(invoice.extras.get("sbc_lic_price", SBC_DEFAULT_LIC_PRICE))
 
     # ✅ Requisito: si subtotal es negativo, los prices deben ser negativos
     if subtotal_negative:
         sip_price = -abs(sip_price)
         lic_price = -abs(lic_price)
 
-    if concept == OTRO:
-        return _build_custom_into_sbc_table(invoice, sip_mbps, lic_qty, sip_price, lic_price)
+    # Columnas SBC iguales en todas las líneas de la factura: se escriben 1 vez en la base
+    # (y float() de cada precio 1 vez por factura, no por línea)
+    base = line_base(_SBC_TEMPLATE, invoice)
+    base["Siptrunk (MBPS)"] = sip_mbps
+    base["Licences (Quantity)"] = lic_qty
+    base["Siptrunk price"] = float(sip_price)
+    base["Licences price"] = float(lic_price)
 
-    lines: List[LineItem] = []
-    for cc, gl, pct in SBC_SPLIT:
-        amt = q2(invoice.subtotal * (pct / Decimal("100")))
-        lines.append(
-            _make_sbc_line(
-                invoice,
-                SBC_DEFAULT_CONCEPT,
-                cc,
-                gl,
-                amt,
-                iva_rate,
-                sip_mbps,
-                lic_qty,
-                sip_price,
-                lic_price,
-            )
-        )
+    if concept == OTRO:
+        return _build_custom_into_sbc_table(invoice, base)
 
-    # Ajuste por redondeo para cerrar subtotal
-    total_assigned = q2(sum(Decimal(str(li.values["Subtotal assigned by CC"])) for li in lines))
-    diff = q2(invoice.subtotal - total_assigned)
-    if diff != 0:
-        lines[-1].values["Subtotal assigned by CC"] = q2(
-            Decimal(str(lines[-1].values["Subtotal assigned by CC"])) + diff
+    # Reparto en centavos enteros; la última línea recibe el resto (cierre exacto)
+    amounts = split_cents(to_cents(invoice.subtotal), SBC_SPLIT_BP)
+    return [
+        _make_sbc_line(
+            base,
+            SBC_DEFAULT_CONCEPT,
+            cc,
+            gl,
+            from_cents(c),
+            iva_rate,
         )
-        iva, total = calc_iva_and_total(lines[-1].values["Subtotal assigned by CC"], iva_rate)
-        lines[-1].values["IVA assigned by CC"] = iva
-        lines[-1].values["Total assigned by CC"] = total
-
-    return lines
+        for (cc, gl, _pct), c in zip(SBC_SPLIT, amounts, strict=True)
+    ]
 
 
-def _build_custom_into_sbc_table(
-    invoice: InvoiceInput, sip_mbps: int, lic_qty: int, sip_price: Decimal, lic_price: Decimal
-) -> List[LineItem]:
+def _build_custom_into_sbc_table(invoice: InvoiceInput, base: Dict[str, Any]) -> List[LineItem]:
     iva_rate = invoice.iva_rate
     concept_general = (invoice.extras.get("custom_concept") or "").strip() or "SBC - Custom"
 
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         return [
             _make_sbc_line(
-                invoice,
-                (alloc.concept or concept_general).strip(),
-                alloc.cc,
-                alloc.gl_account,
+                base,
+                alloc_concept.strip() if alloc_concept else concept_general,
+                cc,
+                gl,
                 amount,
                 iva_rate,
-                sip_mbps,
-                lic_qty,
-                sip_price,
-                lic_price,
             )
-            for alloc, amount in pairs
+            for alloc_concept, cc, gl, amount in rows
         ]
 
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para SBC personalizado sin split debes ingresar CC y GL account.")
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para SBC personalizado sin split debes ingresar CC y GL account.",
+    )
     return [
         _make_sbc_line(
-            invoice,
+            base,
             concept_general,
-            int(cc),
-            int(gl),
+            cc,
+            gl,
             invoice.subtotal,
             iva_rate,
-            sip_mbps,
-            lic_qty,
-            sip_price,
-            lic_price,
         )
     ]
 
 
+# Columnas de SBC_TABLE (misma idea que _SIPTRUNK_TEMPLATE)
+_SBC_TEMPLATE = line_template(
+    "Siptrunk (MBPS)", "Licences (Quantity)", "Siptrunk price", "Licences price"
+)
+
+
 def _make_sbc_line(
-    invoice: InvoiceInput,
+    base: Dict[str, Any],
     concept: str,
     cc: int,
     gl: int,
     subtotal_assigned,
     iva_rate,
-    sip_mbps: int,
-    lic_qty: int,
-    sip_price: Decimal,
-    lic_price: Decimal,
 ) -> LineItem:
     iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=SBC_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-            "Siptrunk (MBPS)": int(sip_mbps),
-            "Licences (Quantity)": int(lic_qty),
-            "Siptrunk price": float(sip_price),
-            "Licences price": float(lic_price),
-        },
-    )
+    v = base.copy()
+    v["Service/ concept"] = concept
+    v["CC"] = cc
+    v["GL account"] = gl
+    v["Subtotal assigned by CC"] = subtotal_assigned
+    v["IVA assigned by CC"] = iva
+    v["Total assigned by CC"] = total
+    return LineItem(table_name=SBC_TABLE, values=v)
 
 
 # ---------------------------
@@ -369,24 +330,16 @@ def _build_mobile(invoice: InvoiceInput) -> List[LineItem]:
     if concept == OTRO:
         return _build_custom_into_mobile_table(invoice, phone_lines)
 
-    lines: List[LineItem] = []
-    for cc, gl, pct in MOBILE_SPLIT:
-        amt = q2(invoice.subtotal * (pct / Decimal("100")))
-        lines.append(
-            _make_mobile_line(invoice, MOBILE_DEFAULT_CONCEPT, cc, gl, amt, iva_rate, phone_lines)
-        )
+    base = line_base(_MOBILE_TEMPLATE, invoice)
 
-    total_assigned = q2(sum(Decimal(str(li.values["Subtotal assigned by CC"])) for li in lines))
-    diff = q2(invoice.subtotal - total_assigned)
-    if diff != 0:
-        lines[-1].values["Subtotal assigned by CC"] = q2(
-            Decimal(str(lines[-1].values["Subtotal assigned by CC"])) + diff
+    # Reparto en centavos enteros; la última línea recibe el resto (cierre exacto)
+    amounts = split_cents(to_cents(invoice.subtotal), MOBILE_SPLIT_BP)
+    return [
+        _make_mobile_line(
+            base, MOBILE_DEFAULT_CONCEPT, cc, gl, from_cents(c), iva_rate, phone_lines
         )
-        iva, total = calc_iva_and_total(lines[-1].values["Subtotal assigned by CC"], iva_rate)
-        lines[-1].values["IVA assigned by CC"] = iva
-        lines[-1].values["Total assigned by CC"] = total
-
-    return lines
+        for (cc, gl, _pct), c in zip(MOBILE_SPLIT, amounts, strict=True)
+    ]
 
 
 def _build_custom_into_mobile_table(invoice: InvoiceInput, phone_lines: int) -> List[LineItem]:
@@ -394,37 +347,38 @@ def _build_custom_into_mobile_table(invoice: InvoiceInput, phone_lines: int) ->
     concept_general = (
         invoice.extras.get("custom_concept") or ""
     ).strip() or "Claro Mobile - Custom"
+    base = line_base(_MOBILE_TEMPLATE, invoice)
 
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         return [
             _make_mobile_line(
-                invoice,
-                (alloc.concept or concept_general).strip(),
-                alloc.cc,
-                alloc.gl_account,
+                base,
+                alloc_concept.strip() if alloc_concept else concept_general,
+                cc,
+                gl,
                 amount,
                 iva_rate,
                 phone_lines,
             )
-            for alloc, amount in pairs
+            for alloc_concept, cc, gl, amount in rows
         ]
 
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para Mobile personalizado sin split debes ingresar CC y GL account.")
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para Mobile personalizado sin split debes ingresar CC y GL account.",
+    )
     return [
-        _make_mobile_line(
-            invoice, concept_general, int(cc), int(gl), invoice.subtotal, iva_rate, phone_lines
-        )
+        _make_mobile_line(base, concept_general, cc, gl, invoice.subtotal, iva_rate, phone_lines)
     ]
 
 
+# Columnas de MOBILE_TABLE
+_MOBILE_TEMPLATE = line_template("Phone lines quantity")
+
+
 def _make_mobile_line(
-    invoice: InvoiceInput,
+    base: Dict[str, Any],
     concept: str,
     cc: int,
     gl: int,
@@ -433,20 +387,22 @@ def _make_mobile_line(
     phone_lines_qty: int,
 ) -> LineItem:
     iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=MOBILE_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-            "Phone lines quantity": int(phone_lines_qty),
-        },
-    )
+    v = base.copy()
+    v["Service/ concept"] = concept
+    v["CC"] = cc
+    v["GL account"] = gl
+    v["Subtotal assigned by CC"] = subtotal_assigned
+    v["IVA assigned by CC"] = iva
+    v["Total assigned by CC"] = total
+    v["Phone lines quantity"] = phone_lines_qty
+    return LineItem(table_name=MOBILE_TABLE, values=v)
+
+
+# ---------------------------
+# Dispatch por tipo de servicio (1 dict.get en vez de if por tipo)
+# ---------------------------
+_BUILDERS_BY_SERVICE: Dict[str, Callable[[InvoiceInput], List[LineItem]]] = {
+    "siptrunk": _build_siptrunk,
+    "sbc": _build_sbc,
+    "mobile": _build_mobile,
+}
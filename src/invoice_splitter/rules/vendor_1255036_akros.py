@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from functools import partial
 from typing import List
 
 from invoice_splitter.models import InvoiceInput, LineItem
 from invoice_splitter.rules.common import (
-    calc_iva_and_total,
-    q2,
-    validate_and_compute_allocations,
+    custom_cc_gl,
+    custom_split_rows,
+    from_cents,
+    line_base,
+    line_template,
+    make_line,
+    split_cents,
+    to_cents,
 )
 
 AKROS_TABLE = "Akros_bills_table"
@@ -24,6 +30,7 @@ PCT1 = Decimal("0.40")
 CC2 = 7475036
 GL2 = 7427000000
 PCT2 = Decimal("0.60")
+SPLIT_BP = (int(PCT1 * 10000), int(PCT2 * 10000))  # en puntos básicos (10000 = 100%)
 
 
 VENDOR_ID = 1255036
@@ -57,66 +64,36 @@ def build_lines_for_akros(invoice: InvoiceInput) -> List[LineItem]:
 
     concept = (invoice.service_concept or "").strip() or DEFAULT_CONCEPT
     iva_rate = invoice.iva_rate
+    base = line_base(_LINE_TEMPLATE, invoice)
 
     # --- Caso 1: default concept -> split estándar ---
     if concept == DEFAULT_CONCEPT:
-        part1 = q2(invoice.subtotal * PCT1)
-        part2 = q2(invoice.subtotal * PCT2)
+        # En centavos enteros: la 2da parte recibe el resto (suman exacto el subtotal)
+        cents1, cents2 = split_cents(to_cents(invoice.subtotal), SPLIT_BP)
+        part1, part2 = from_cents(cents1), from_cents(cents2)
         return [
-            _make_line(invoice, concept, CC1, GL1, part1, iva_rate),
-            _make_line(invoice, concept, CC2, GL2, part2, iva_rate),
+            _make_line(base, concept, CC1, GL1, part1, iva_rate),
+            _make_line(base, concept, CC2, GL2, part2, iva_rate),
         ]
 
     # --- Caso 2: concept custom con split configurado ---
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
-
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         lines: List[LineItem] = []
-        for alloc, amount in pairs:
-            line_concept = (alloc.concept or concept).strip()
-            lines.append(
-                _make_line(invoice, line_concept, alloc.cc, alloc.gl_account, amount, iva_rate)
-            )
+        for alloc_concept, cc, gl, amount in rows:
+            line_concept = alloc_concept.strip() if alloc_concept else concept
+            lines.append(_make_line(base, line_concept, cc, gl, amount, iva_rate))
         return lines
 
     # --- Caso 3: concept custom sin split -> 1 línea 100% a CC/GL del usuario ---
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para concepto personalizado en AKROS debes ingresar CC y GL account.")
-
-    return [_make_line(invoice, concept, int(cc), int(gl), invoice.subtotal, iva_rate)]
-
-
-def _make_line(
-    invoice: InvoiceInput,
-    concept: str,
-    cc: int,
-    gl: int,
-    subtotal_assigned: Decimal,
-    iva_rate: Decimal,
-) -> LineItem:
-    """
-    Construye una fila para Akros_bills_table con IVA/Total calculados.
-    cc y gl numéricos (int), bill number texto (9 dígitos), fecha date.
-    """
-    iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-
-    return LineItem(
-        table_name=AKROS_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-        },
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para concepto personalizado en AKROS debes ingresar CC y GL account.",
     )
+
+    return [_make_line(base, concept, cc, gl, invoice.subtotal, iva_rate)]
+
+
+# Columnas de AKROS_TABLE (plantilla base de line_base)
+_LINE_TEMPLATE = line_template()
+_make_line = partial(make_line, AKROS_TABLE)
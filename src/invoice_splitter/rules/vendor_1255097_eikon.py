@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from decimal import Decimal
-from typing import List
+from functools import partial
+from typing import Dict, List, Tuple
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, q2, validate_and_compute_allocations
-
+from invoice_splitter.rules.common import (
+    custom_cc_gl,
+    custom_split_rows,
+    from_cents,
+    line_base,
+    line_template,
+    make_line,
+    split_cents,
+    to_cents,
+)
 
 VENDOR_ID = 1255097
 
@@ -17,13 +25,18 @@ def build_lines_for_vendor(invoice: InvoiceInput) -> List[LineItem]:
 EIKON_TABLE = "Eikon_table"
 GL_DEFAULT = 7980100000
 
-CONCEPTS = {
-    "Infrastructure cloud (Monthly)",
-    "Azure Consumptions (biannual)",
-    "Maintenance and support (annual)",
-    "Domains (annual)",
+# Concepto estándar -> reparto [(CC, % en puntos básicos)], todos con GL_DEFAULT.
+# Un solo dict.get resuelve concepto estándar vs custom (antes: set + cadena de if).
+CONCEPT_SPLITS: Dict[str, Tuple[Tuple[int, int], ...]] = {
+    "Infrastructure cloud (Monthly)": ((7457036, 6000), (7475036, 4000)),
+    "Azure Consumptions (biannual)": ((7475036, 10000),),
+    "Maintenance and support (annual)": ((1100036, 10000),),
+    "Domains (annual)": ((7475036, 10000),),
 }
 
+# Solo lectura: conceptos válidos (las claves de CONCEPT_SPLITS)
+CONCEPTS = frozenset(CONCEPT_SPLITS)
+
 
 def build_lines_for_eikon(invoice: InvoiceInput) -> List[LineItem]:
     """
@@ -43,73 +56,39 @@ def build_lines_for_eikon(invoice: InvoiceInput) -> List[LineItem]:
         concept = "Infrastructure cloud (Monthly)"
 
     iva_rate = invoice.iva_rate
+    base = line_base(_LINE_TEMPLATE, invoice)
 
-    # Caso custom
-    if concept not in CONCEPTS:
-        # Si el usuario configuró splits:
-        if invoice.alloc_mode and invoice.allocations:
-            pairs = validate_and_compute_allocations(
-                invoice.subtotal, invoice.alloc_mode, invoice.allocations
-            )
-            lines: List[LineItem] = []
-            for alloc, amount in pairs:
-                line_concept = (alloc.concept or concept).strip()
-                lines.append(
-                    _make_line(invoice, line_concept, alloc.cc, alloc.gl_account, amount, iva_rate)
-                )
-            return lines
-
-        # Si NO hay split, comportamiento actual: 1 línea 100% a CC/GL del usuario
-        cc = invoice.extras.get("cc")
-        gl = invoice.extras.get("gl_account")
-        if cc is None or gl is None:
-            raise ValueError("Para concepto personalizado en EIKON debes ingresar CC y GL account.")
-        return [_make_line(invoice, concept, int(cc), int(gl), invoice.subtotal, iva_rate)]
+    spec = CONCEPT_SPLITS.get(concept)
 
     # Casos estándar
-    if concept == "Infrastructure cloud (Monthly)":
-        part1 = q2(invoice.subtotal * Decimal("0.60"))
-        part2 = q2(invoice.subtotal * Decimal("0.40"))
+    if spec is not None:
+        if len(spec) == 1:
+            return [_make_line(base, concept, spec[0][0], GL_DEFAULT, invoice.subtotal, iva_rate)]
+        # En centavos enteros: la última parte recibe el resto (suman exacto el subtotal)
+        amounts = split_cents(to_cents(invoice.subtotal), [bp for _cc, bp in spec])
         return [
-            _make_line(invoice, concept, 7457036, GL_DEFAULT, part1, iva_rate),
-            _make_line(invoice, concept, 7475036, GL_DEFAULT, part2, iva_rate),
+            _make_line(base, concept, cc, GL_DEFAULT, from_cents(c), iva_rate)
+            for (cc, _bp), c in zip(spec, amounts, strict=True)
         ]
 
-    if concept == "Azure Consumptions (biannual)":
-        return [_make_line(invoice, concept, 7475036, GL_DEFAULT, invoice.subtotal, iva_rate)]
-
-    if concept == "Maintenance and support (annual)":
-        return [_make_line(invoice, concept, 1100036, GL_DEFAULT, invoice.subtotal, iva_rate)]
-
-    if concept == "Domains (annual)":
-        return [_make_line(invoice, concept, 7475036, GL_DEFAULT, invoice.subtotal, iva_rate)]
-
-    # fallback defensivo
-    raise ValueError(f"Concepto EIKON no manejado: {concept}")
-
-
-def _make_line(
-    invoice: InvoiceInput,
-    concept: str,
-    cc: int,
-    gl: int,
-    subtotal_assigned: Decimal,
-    iva_rate: Decimal,
-) -> LineItem:
-    iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=EIKON_TABLE,
-        values={
-            "Date": invoice.invoice_date,  # escribiremos como fecha real
-            "Bill number": invoice.bill_number,  # texto 9 dígitos
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": cc,
-            "GL account": gl,
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-        },
+    # Caso custom
+    # Si el usuario configuró splits:
+    rows = custom_split_rows(invoice)
+    if rows is not None:
+        lines: List[LineItem] = []
+        for alloc_concept, cc, gl, amount in rows:
+            line_concept = alloc_concept.strip() if alloc_concept else concept
+            lines.append(_make_line(base, line_concept, cc, gl, amount, iva_rate))
+        return lines
+
+    # Si NO hay split, comportamiento actual: 1 línea 100% a CC/GL del usuario
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para concepto personalizado en EIKON debes ingresar CC y GL account.",
     )
+    return [_make_line(base, concept, cc, gl, invoice.subtotal, iva_rate)]
+
+
+# Columnas de EIKON_TABLE (plantilla base de line_base)
+_LINE_TEMPLATE = line_template()
+_make_line = partial(make_line, EIKON_TABLE)
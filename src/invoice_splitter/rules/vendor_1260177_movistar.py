@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import List
+from typing import Any, Dict, List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, q2, validate_and_compute_allocations
+from invoice_splitter.rules.common import (
+    calc_iva_and_total,
+    custom_cc_gl,
+    custom_split_rows,
+    from_cents,
+    line_base,
+    line_template,
+    split_cents,
+    to_cents,
+)
 
 MOVISTAR_TABLE = "Movistar_table"
 DEFAULT_CONCEPT = "10 lines DRP (4 lines 35 GB + 6 lines 53 GB)"
@@ -17,6 +26,7 @@ PCT1 = Decimal("0.60")
 CC2 = 3941036
 GL2 = 3649000000
 PCT2 = Decimal("0.40")
+SPLIT_BP = (int(PCT1 * 10000), int(PCT2 * 10000))  # en puntos básicos (10000 = 100%)
 
 DEFAULT_LINES = 10
 
@@ -47,43 +57,48 @@ def build_lines_for_movistar(invoice: InvoiceInput) -> List[LineItem]:
     except Exception:
         raise ValueError("Phone lines quantity debe ser un número entero.")
 
+    base = line_base(_LINE_TEMPLATE, invoice)
+
     # Default concept -> standard split
     if concept == DEFAULT_CONCEPT:
-        part1 = q2(invoice.subtotal * PCT1)
-        part2 = q2(invoice.subtotal * PCT2)
+        # En centavos enteros: la 2da parte recibe el resto (suman exacto el subtotal)
+        cents1, cents2 = split_cents(to_cents(invoice.subtotal), SPLIT_BP)
+        part1, part2 = from_cents(cents1), from_cents(cents2)
         return [
-            _make_line(invoice, concept, CC1, GL1, part1, iva_rate, phone_lines),
-            _make_line(invoice, concept, CC2, GL2, part2, iva_rate, phone_lines),
+            _make_line(base, concept, CC1, GL1, part1, iva_rate, phone_lines),
+            _make_line(base, concept, CC2, GL2, part2, iva_rate, phone_lines),
         ]
 
     # Custom concept with split
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         return [
             _make_line(
-                invoice,
-                (alloc.concept or concept).strip(),
-                alloc.cc,
-                alloc.gl_account,
+                base,
+                alloc_concept.strip() if alloc_concept else concept,
+                cc,
+                gl,
                 amount,
                 iva_rate,
                 phone_lines,
             )
-            for alloc, amount in pairs
+            for alloc_concept, cc, gl, amount in rows
         ]
 
     # Custom concept without split
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para concepto personalizado en MOVISTAR debes ingresar CC y GL account.")
-    return [_make_line(invoice, concept, int(cc), int(gl), invoice.subtotal, iva_rate, phone_lines)]
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para concepto personalizado en MOVISTAR debes ingresar CC y GL account.",
+    )
+    return [_make_line(base, concept, cc, gl, invoice.subtotal, iva_rate, phone_lines)]
+
+
+# Columnas de MOVISTAR_TABLE (plantilla base de line_base)
+_LINE_TEMPLATE = line_template("Phone lines quantity")
 
 
 def _make_line(
-    invoice: InvoiceInput,
+    base: Dict[str, Any],
     concept: str,
     cc: int,
     gl: int,
@@ -92,20 +107,12 @@ def _make_line(
     phone_lines_qty: int,
 ) -> LineItem:
     iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=MOVISTAR_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-            "Phone lines quantity": phone_lines_qty,
-        },
-    )
+    v = base.copy()
+    v["Service/ concept"] = concept
+    v["CC"] = cc
+    v["GL account"] = gl
+    v["Subtotal assigned by CC"] = subtotal_assigned
+    v["IVA assigned by CC"] = iva
+    v["Total assigned by CC"] = total
+    v["Phone lines quantity"] = phone_lines_qty
+    return LineItem(table_name=MOVISTAR_TABLE, values=v)
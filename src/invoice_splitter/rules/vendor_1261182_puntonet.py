@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+from functools import partial
 from typing import List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, validate_and_compute_allocations
+from invoice_splitter.rules.common import (
+    custom_cc_gl,
+    custom_split_rows,
+    line_base,
+    line_template,
+    make_line,
+)
 
 PUNTONET_TABLE = "Puntonet_table"
 DEFAULT_CONCEPT = "40 MBPS"
@@ -28,60 +35,40 @@ def build_lines_for_puntonet(invoice: InvoiceInput) -> List[LineItem]:
         - Si hay split custom (alloc_mode + allocations): N líneas (CC/GL por línea).
         - Si no hay split: 1 línea 100% con CC/GL del usuario (invoice.extras['cc'], ['gl_account']).
     """
-    concept = (invoice.service_concept or "").strip() or DEFAULT_CONCEPT
+    concept = invoice.service_concept
+    # Camino más común: concepto ya exacto al default -> sin normalizar
+    if concept != DEFAULT_CONCEPT:
+        concept = (concept or "").strip() or DEFAULT_CONCEPT
     iva_rate = invoice.iva_rate
+    base = line_base(_LINE_TEMPLATE, invoice)
 
     # Default concept
     if concept == DEFAULT_CONCEPT:
-        return [_make_line(invoice, concept, DEFAULT_CC, DEFAULT_GL, invoice.subtotal, iva_rate)]
+        return [_make_line(base, concept, DEFAULT_CC, DEFAULT_GL, invoice.subtotal, iva_rate)]
 
     # Custom concept with split
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         return [
             _make_line(
-                invoice,
-                (alloc.concept or concept).strip(),
-                alloc.cc,
-                alloc.gl_account,
+                base,
+                alloc_concept.strip() if alloc_concept else concept,
+                cc,
+                gl,
                 amount,
                 iva_rate,
             )
-            for alloc, amount in pairs
+            for alloc_concept, cc, gl, amount in rows
         ]
 
     # Custom concept without split
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para concepto personalizado en PUNTONET debes ingresar CC y GL account.")
-    return [_make_line(invoice, concept, int(cc), int(gl), invoice.subtotal, iva_rate)]
-
-
-def _make_line(
-    invoice: InvoiceInput,
-    concept: str,
-    cc: int,
-    gl: int,
-    subtotal_assigned,
-    iva_rate,
-) -> LineItem:
-    iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-    return LineItem(
-        table_name=PUNTONET_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-        },
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para concepto personalizado en PUNTONET debes ingresar CC y GL account.",
     )
+    return [_make_line(base, concept, cc, gl, invoice.subtotal, iva_rate)]
+
+
+# Columnas de PUNTONET_TABLE (plantilla base de line_base)
+_LINE_TEMPLATE = line_template()
+_make_line = partial(make_line, PUNTONET_TABLE)
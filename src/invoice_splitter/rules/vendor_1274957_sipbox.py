@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from functools import partial
 from typing import List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, validate_and_compute_allocations
-
+from invoice_splitter.rules.common import (
+    custom_cc_gl,
+    custom_split_rows,
+    line_base,
+    line_template,
+    make_line,
+)
 
 SIPBOX_TABLE = "Sipbox_table"
 
@@ -41,63 +47,35 @@ def build_lines_for_sipbox(invoice: InvoiceInput) -> List[LineItem]:
             - cada allocation puede traer concept propio; si no, usa el concepto general
     """
 
-    concept = (invoice.service_concept or "").strip() or DEFAULT_CONCEPT
+    concept = invoice.service_concept
+    # Camino más común: concepto ya exacto al default -> sin normalizar
+    if concept != DEFAULT_CONCEPT:
+        concept = (concept or "").strip() or DEFAULT_CONCEPT
     iva_rate = invoice.iva_rate
+    base = line_base(_LINE_TEMPLATE, invoice)
 
     # --- Caso 1: Concepto default -> comportamiento estándar (1 línea) ---
     if concept == DEFAULT_CONCEPT:
-        return [_make_line(invoice, concept, DEFAULT_CC, DEFAULT_GL, invoice.subtotal, iva_rate)]
+        return [_make_line(base, concept, DEFAULT_CC, DEFAULT_GL, invoice.subtotal, iva_rate)]
 
     # --- Caso 2: Concepto custom -> si hay split custom, usarlo ---
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
-
+    rows = custom_split_rows(invoice)
+    if rows is not None:
         lines: List[LineItem] = []
-        for alloc, amount in pairs:
-            line_concept = (alloc.concept or concept).strip()
-            lines.append(
-                _make_line(invoice, line_concept, alloc.cc, alloc.gl_account, amount, iva_rate)
-            )
+        for alloc_concept, cc, gl, amount in rows:
+            line_concept = alloc_concept.strip() if alloc_concept else concept
+            lines.append(_make_line(base, line_concept, cc, gl, amount, iva_rate))
         return lines
 
     # --- Caso 3: Concepto custom sin split -> 1 línea 100% con CC/GL del usuario ---
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError("Para concepto personalizado en SIPBOX debes ingresar CC y GL account.")
-
-    return [_make_line(invoice, concept, int(cc), int(gl), invoice.subtotal, iva_rate)]
-
-
-def _make_line(
-    invoice: InvoiceInput,
-    concept: str,
-    cc: int,
-    gl: int,
-    subtotal_assigned: object,
-    iva_rate: object,
-) -> LineItem:
-    """
-    Construye una fila para Sipbox_table con IVA/Total calculados.
-    cc y gl numéricos (int), bill number texto, fecha date.
-    """
-    iva, total = calc_iva_and_total(subtotal_assigned, iva_rate)
-
-    return LineItem(
-        table_name=SIPBOX_TABLE,
-        values={
-            "Date": invoice.invoice_date,
-            "Bill number": invoice.bill_number,
-            "ID": invoice.vendor_id,
-            "Vendor": invoice.vendor_name,
-            "Service/ concept": concept,
-            "CC": int(cc),
-            "GL account": int(gl),
-            "Subtotal assigned by CC": subtotal_assigned,
-            "% IVA": iva_rate,
-            "IVA assigned by CC": iva,
-            "Total assigned by CC": total,
-        },
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para concepto personalizado en SIPBOX debes ingresar CC y GL account.",
     )
+
+    return [_make_line(base, concept, cc, gl, invoice.subtotal, iva_rate)]
+
+
+# Columnas de SIPBOX_TABLE (plantilla base de line_base)
+_LINE_TEMPLATE = line_template()
+_make_line = partial(make_line, SIPBOX_TABLE)
@@ -2,12 +2,30 @@ from __future__ import annotations
 
 import re
 from decimal import Decimal
+from functools import lru_cache
 from typing import List
 
 from invoice_splitter.models import InvoiceInput, LineItem
-from invoice_splitter.rules.common import calc_iva_and_total, q2, validate_and_compute_allocations
-
-
+from invoice_splitter.rules.common import (
+    custom_cc_gl,
+    custom_split_rows,
+    line_base,
+    line_template,
+    make_line,
+    q2,
+)
+
+# Patrones de _slug_table_name compilados 1 vez
+_RE_WS = re.compile(r"\s+")
+_RE_BAD = re.compile(r"[^0-9A-Za-z_]")
+_RE_DUP = re.compile(r"_+")
+
+# Columnas de las tablas genéricas (plantilla base de line_base)
+_LINE_TEMPLATE = line_template()
+
+
+# Función pura y los vendors se repiten mucho entre facturas: 1 cálculo por vendor
+@lru_cache(maxsize=4096)
 def _slug_table_name(vendor_name: str, vendor_id: int) -> str:
     """
     Construye un nombre de tabla único y estable para vendors genéricos.
@@ -20,9 +38,9 @@ def _slug_table_name(vendor_name: str, vendor_id: int) -> str:
       - Se trunca el nombre base si queda demasiado largo, para mantener un nombre razonable.
     """
     base = (vendor_name or "").strip()
-    base = re.sub(r"\s+", "_", base)
-    base = re.sub(r"[^0-9A-Za-z_]", "_", base)
-    base = re.sub(r"_+", "_", base).strip("_")
+    base = _RE_WS.sub("_", base)
+    base = _RE_BAD.sub("_", base)
+    base = _RE_DUP.sub("_", base).strip("_")
 
     if not base:
         base = "Vendor"
@@ -51,60 +69,28 @@ def build_lines_generic(invoice: InvoiceInput) -> List[LineItem]:
 
     concept_general = (invoice.service_concept or "").strip() or "Concepto personalizado"
     iva_rate = invoice.iva_rate
-
-    # Caso split personalizado
-    if invoice.alloc_mode and invoice.allocations:
-        pairs = validate_and_compute_allocations(
-            invoice.subtotal, invoice.alloc_mode, invoice.allocations
-        )
-        lines: List[LineItem] = []
-        for alloc, amount in pairs:
-            iva, total = calc_iva_and_total(amount, iva_rate)
-            lines.append(
-                LineItem(
-                    table_name=table_name,
-                    values={
-                        "Date": invoice.invoice_date,
-                        "Bill number": invoice.bill_number,
-                        "ID": invoice.vendor_id,
-                        "Vendor": invoice.vendor_name,
-                        "Service/ concept": (alloc.concept or concept_general).strip()
-                        or concept_general,
-                        "CC": int(alloc.cc),
-                        "GL account": int(alloc.gl_account),
-                        "Subtotal assigned by CC": q2(amount),
-                        "% IVA": iva_rate,
-                        "IVA assigned by CC": iva,
-                        "Total assigned by CC": total,
-                    },
-                )
+    base = line_base(_LINE_TEMPLATE, invoice)
+
+    # Caso split personalizado (los montos ya salen a 2 decimales de los centavos: sin q2)
+    rows = custom_split_rows(invoice)
+    if rows is not None:
+        return [
+            make_line(
+                table_name,
+                base,
+                (alloc_concept and alloc_concept.strip()) or concept_general,
+                cc,
+                gl,
+                amount,
+                iva_rate,
             )
-        return lines
+            for alloc_concept, cc, gl, amount in rows
+        ]
 
     # Caso sin split: requiere CC/GL en extras
-    cc = invoice.extras.get("cc")
-    gl = invoice.extras.get("gl_account")
-    if cc is None or gl is None:
-        raise ValueError(
-            "Para vendors sin regla específica debes ingresar CC y GL (o configurar split personalizado)."
-        )
-
-    iva, total = calc_iva_and_total(invoice.subtotal, iva_rate)
-    return [
-        LineItem(
-            table_name=table_name,
-            values={
-                "Date": invoice.invoice_date,
-                "Bill number": invoice.bill_number,
-                "ID": invoice.vendor_id,
-                "Vendor": invoice.vendor_name,
-                "Service/ concept": concept_general,
-                "CC": int(cc),
-                "GL account": int(gl),
-                "Subtotal assigned by CC": q2(invoice.subtotal),
-                "% IVA": iva_rate,
-                "IVA assigned by CC": iva,
-                "Total assigned by CC": total,
-            },
-        )
-    ]
+    cc, gl = custom_cc_gl(
+        invoice,
+        "Para vendors sin regla específica debes ingresar CC y GL (o configurar split personalizado).",
+    )
+
+    return [make_line(table_name, base, concept_general, cc, gl, q2(invoice.subtotal), iva_rate)]
@@ -14,7 +14,7 @@ from pathlib import Path as PathlibPath
 from invoice_splitter.excel.vendors import Vendor, load_vendors_from_table
 from invoice_splitter.excel.writer import ExcelWriteError, apply_transaction
 from invoice_splitter.models import InvoiceInput, LineItem, Allocation
-from invoice_splitter.rules.registry import build_lines
+from invoice_splitter.rules.registry import build_lines, rows_by_table
 from invoice_splitter.ui.split_editor import SplitEditorDialog
 from invoice_splitter.utils.dates import UI_DATE_FORMAT, parse_ui_date, today
 from invoice_splitter.utils.money import normalize_bill_number, parse_decimal_user_input, parse_iva
@@ -1679,9 +1679,7 @@ class MainWindow(ttk.Window):
             if not resp:
                 return
 
-            table_to_rows: Dict[str, List[Dict[str, object]]] = {}
-            for li in self.preview_lines:
-                table_to_rows.setdefault(li.table_name, []).append(li.values)
+            table_to_rows = rows_by_table(self.preview_lines)
 
             # ---------------------------
             # A4) General registry row (siempre, sin split)
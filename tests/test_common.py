@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+from invoice_splitter.models import Allocation
+from invoice_splitter.rules.common import (
+    calc_iva_and_total,
+    from_cents,
+    split_cents,
+    to_cents,
+    validate_and_compute_allocations,
+)
+
+TWOPLACES = Decimal("0.01")
+
+
+def _q2(value: Decimal) -> Decimal:
+    return value.quantize(TWOPLACES, rounding=ROUND_HALF_UP)
+
+
+def _random_amounts(n: int = 20_000, seed: int = 1234) -> list[Decimal]:
+    """Montos a 2 decimales (positivos y negativos), como los que llegan a las reglas."""
+    rnd = random.Random(seed)
+    return [from_cents(rnd.randint(-(10**9), 10**9)) for _ in range(n)]
+
+
+# ---------------------------
+# calc_iva_and_total
+# ---------------------------
+@pytest.mark.parametrize(
+    ("subtotal", "rate", "iva", "total"),
+    [
+        (Decimal("100.00"), Decimal("0.15"), Decimal("15.00"), Decimal("115.00")),
+        (Decimal("0.03"), Decimal("0.15"), Decimal("0.00"), Decimal("0.03")),
+        # 0.10 * 0.15 = 0.015 -> HALF_UP
+        (Decimal("0.10"), Decimal("0.15"), Decimal("0.02"), Decimal("0.12")),
+        (Decimal("-0.10"), Decimal("0.15"), Decimal("-0.02"), Decimal("-0.12")),
+        (Decimal("1872.30"), Decimal("0.12"), Decimal("224.68"), Decimal("2096.98")),
+        (Decimal("50.00"), Decimal("0"), Decimal("0.00"), Decimal("50.00")),
+    ],
+)
+def test_calc_iva_and_total_examples(subtotal, rate, iva, total):
+    got_iva, got_total = calc_iva_and_total(subtotal, rate)
+    assert (got_iva, got_total) == (iva, total)
+    assert got_iva.as_tuple().exponent == -2
+    assert got_total.as_tuple().exponent == -2
+
+
+@pytest.mark.parametrize("rate", [Decimal("0.15"), Decimal("0.12"), Decimal("0.0725")])
+def test_calc_iva_and_total_matches_double_quantize(rate):
+    # Referencia: la versión anterior (IVA y total redondeados por separado)
+    for subtotal in _random_amounts():
+        iva = _q2(subtotal * rate)
+        assert calc_iva_and_total(subtotal, rate) == (iva, _q2(subtotal + iva))
+
+
+# ---------------------------
+# split_cents / to_cents / from_cents
+# ---------------------------
+def test_cents_roundtrip():
+    for amount in _random_amounts(2_000):
+        assert from_cents(to_cents(amount)) == amount
+        assert str(from_cents(to_cents(amount))) == str(amount)
+    assert to_cents(Decimal("0.005")) == 1
+    assert to_cents(Decimal("-0.005")) == -1
+
+
+@pytest.mark.parametrize(
+    "bps",
+    [(6000, 4000), (4000, 6000), (4091, 1563, 2841, 1505), (3700, 1100, 3200, 1500, 500), (10000,)],
+)
+def test_split_cents_matches_decimal_split(bps):
+    # Referencia: q2(monto * pct) por parte y la última recibe el resto
+    for amount in _random_amounts(5_000):
+        cents = split_cents(to_cents(amount), bps)
+        assert len(cents) == len(bps)
+        assert sum(cents) == to_cents(amount)
+        expected = [_q2(amount * bp / 10000) for bp in bps[:-1]]
+        expected.append(amount - sum(expected, Decimal("0")))
+        assert [from_cents(c) for c in cents] == expected
+
+
+def test_split_cents_half_up_is_symmetric():
+    # 0.05 al 50/50: 2.5 centavos -> 3 (HALF_UP sobre el valor absoluto)
+    assert split_cents(5, (5000, 5000)) == [3, 2]
+    assert split_cents(-5, (5000, 5000)) == [-3, -2]
+    assert split_cents(0, (6000, 4000)) == [0, 0]
+
+
+# ---------------------------
+# validate_and_compute_allocations (cuadre en centavos)
+# ---------------------------
+def test_percent_rounding_diff_goes_to_last_line():
+    allocs = [
+        Allocation(cc=1, gl_account=10, percent=Decimal("33.33")),
+        Allocation(cc=2, gl_account=20, percent=Decimal("33.33")),
+        Allocation(cc=3, gl_account=30, percent=Decimal("33.34")),
+    ]
+    pairs = validate_and_compute_allocations(Decimal("100.01"), "percent", allocs)
+    # 33.3333 -> 33.33, 33.3333 -> 33.33, 33.3433 -> 33.34 = 100.00: la última absorbe +0.01
+    assert [a for a, _amount in pairs] == allocs
+    assert [amount for _a, amount in pairs] == [
+        Decimal("33.33"),
+        Decimal("33.33"),
+        Decimal("33.35"),
+    ]
+
+
+def test_percent_split_reconciles_exactly():
+    allocs = [
+        Allocation(cc=1, gl_account=10, percent=Decimal("50")),
+        Allocation(cc=2, gl_account=20, percent=Decimal("50")),
+    ]
+    pairs = validate_and_compute_allocations(Decimal("0.01"), "percent", allocs)
+    # 0.005 + 0.005 -> 0.01 + 0.01 = 0.02: la última absorbe -0.01
+    assert [amount for _a, amount in pairs] == [Decimal("0.01"), Decimal("0.00")]
+
+
+def test_amount_split_within_tolerance_adjusts_last_line():
+    allocs = [
+        Allocation(cc=1, gl_account=10, amount=Decimal("60.00")),
+        Allocation(cc=2, gl_account=20, amount=Decimal("40.01")),
+    ]
+    pairs = validate_and_compute_allocations(Decimal("100.00"), "amount", allocs)
+    assert [amount for _a, amount in pairs] == [Decimal("60.00"), Decimal("40.00")]
+
+
+def test_amount_split_outside_tolerance_raises():
+    allocs = [
+        Allocation(cc=1, gl_account=10, amount=Decimal("60.00")),
+        Allocation(cc=2, gl_account=20, amount=Decimal("40.02")),
+    ]
+    with pytest.raises(ValueError, match="no coincide con el subtotal"):
+        validate_and_compute_allocations(Decimal("100.00"), "amount", allocs)
+
+
+def test_allocations_sum_to_subtotal():
+    rnd = random.Random(99)
+    for _ in range(2_000):
+        subtotal = from_cents(rnd.randint(-(10**7), 10**7))
+        first = Decimal(rnd.randint(0, 10000)) / 100
+        allocs = [
+            Allocation(cc=1, gl_account=10, percent=first),
+            Allocation(cc=2, gl_account=20, percent=100 - first),
+        ]
+        pairs = validate_and_compute_allocations(subtotal, "percent", allocs)
+        assert sum(amount for _a, amount in pairs) == subtotal
+        assert all(amount.as_tuple().exponent == -2 for _a, amount in pairs)
+
+
+def test_invalid_mode_and_empty_allocations():
+    with pytest.raises(ValueError):
+        validate_and_compute_allocations(Decimal("1.00"), "other", [])
+    with pytest.raises(ValueError):
+        validate_and_compute_allocations(Decimal("1.00"), "percent", [])
+
+
+def test_calc_iva_and_total_requires_two_decimals():
+    # Ceros de sobra no rompen la precondición
+    assert calc_iva_and_total(Decimal("10.100"), Decimal("0.15")) == (
+        Decimal("1.52"),
+        Decimal("11.62"),
+    )
+    with pytest.raises(AssertionError, match="2 decimales"):
+        calc_iva_and_total(Decimal("1872.301"), Decimal("0.15"))
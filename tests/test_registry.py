@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from invoice_splitter.models import InvoiceInput
+from invoice_splitter.rules.registry import build_lines, build_lines_batch, rows_by_table
+
+
+def _invoice(vendor_id: int, vendor_name: str, subtotal: str, **kwargs) -> InvoiceInput:
+    return InvoiceInput(
+        invoice_date=date(2024, 1, 2),
+        vendor_id=vendor_id,
+        vendor_name=vendor_name,
+        bill_number="000000123",
+        subtotal=Decimal(subtotal),
+        **kwargs,
+    )
+
+
+def _invoices() -> list[InvoiceInput]:
+    return [
+        _invoice(1254902, "CLARO", "1234.57", service_type="siptrunk"),
+        _invoice(1255036, "AKROS", "100.00"),
+        _invoice(1254902, "CLARO", "-987.65", service_type="mobile"),
+        _invoice(1255036, "AKROS", "0.01"),
+    ]
+
+
+def test_build_lines_batch_is_flat_and_in_input_order():
+    invoices = _invoices()
+    expected = [li for invoice in invoices for li in build_lines(invoice)]
+    assert build_lines_batch(invoices) == expected
+    assert build_lines_batch(iter(invoices)) == expected
+    assert build_lines_batch([]) == []
+
+
+def test_rows_by_table_groups_values_keeping_order():
+    lines = build_lines_batch(_invoices())
+    rows = rows_by_table(lines)
+    assert set(rows) == {li.table_name for li in lines}
+    for table_name, values in rows.items():
+        assert values == [li.values for li in lines if li.table_name == table_name]
+    assert rows_by_table([]) == {}